@@ -0,0 +1,85 @@
+"""On-disk cache of dependency analyses keyed by a task-set fingerprint.
+
+Refinement often yields the same task list for a question (repeated runs,
+retries), so the identify_dependencies answer is reused instead of
+re-sending the same prompt.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from agentfield.logger import log_debug, log_warn
+
+from schemas import Subtask, TaskDependenciesList
+
+DEP_CACHE_ENABLED = os.getenv("DEP_CACHE_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+DEP_CACHE_DIR = Path(
+    os.getenv(
+        "DEP_CACHE_DIR", os.path.join(tempfile.gettempdir(), "agentfield_depcache")
+    )
+)
+DEP_CACHE_TTL = float(os.getenv("DEP_CACHE_TTL", str(86400 * 7)))
+
+
+def dependency_cache_key(
+    tasks: List[Subtask], research_question: str, model: str, prompt_version: int
+) -> str:
+    """
+    Fingerprint a question and its (order-independent) task set, plus the
+    model and dependency prompt version, so switching either one misses
+    instead of serving graphs produced by the old setup.
+    """
+    payload = {
+        "q": research_question,
+        "tasks": sorted((t.task_id, t.description) for t in tasks),
+        "model": model,
+        "prompt_version": prompt_version,
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True).encode()
+    ).hexdigest()
+
+
+def load_dependencies(key: str) -> Optional[TaskDependenciesList]:
+    """Return the cached analysis for ``key`` if present and not expired."""
+    path = DEP_CACHE_DIR / f"{key}.json"
+    try:
+        if time.time() - path.stat().st_mtime > DEP_CACHE_TTL:
+            path.unlink()
+            return None
+        result = TaskDependenciesList.model_validate_json(path.read_text())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        log_warn(f"Dependency cache read failed: {e}")
+        return None
+
+    log_debug(f"Dependency cache hit: {key[:12]}")
+    return result
+
+
+def store_dependencies(key: str, result: TaskDependenciesList) -> None:
+    """Write ``result`` atomically so concurrent readers never see partial JSON."""
+    try:
+        DEP_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=DEP_CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(result.model_dump_json())
+            os.replace(tmp_path, DEP_CACHE_DIR / f"{key}.json")
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except Exception as e:
+        log_warn(f"Dependency cache write failed: {e}")
@@ -0,0 +1,50 @@
+"""Shared embedding helper built on FastEmbed for the deep research agent."""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from functools import lru_cache
+from typing import Iterable, List
+
+# Embeddings run on executor threads; only one of them should load the model
+_load_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _load_model():
+    # Imported lazily so FastEmbed is only required when a cache is enabled
+    from fastembed import TextEmbedding
+
+    model_name = os.getenv("RESEARCH_EMBED_MODEL", "BAAI/bge-small-en-v1.5")
+    return TextEmbedding(model_name=model_name)
+
+
+def embed_texts(texts: Iterable[str]) -> List[List[float]]:
+    """Embed an iterable of strings and return Python lists."""
+
+    with _load_lock:
+        model = _load_model()
+    embeddings = list(model.embed(list(texts)))
+    return [vector.tolist() for vector in embeddings]
+
+
+@lru_cache(maxsize=256)
+def _embed_query_cached(text: str) -> tuple:
+    return tuple(embed_texts([text])[0])
+
+
+def embed_query(text: str) -> List[float]:
+    """Shortcut for single-string embeddings (memoized per process)."""
+
+    return list(_embed_query_cached(text))
+
+
+async def aembed_query(text: str) -> List[float]:
+    """
+    ``embed_query`` on the default executor. FastEmbed is synchronous (and
+    the first call loads the model), so calling it inline from a reasoner
+    would stall every other coroutine on the event loop.
+    """
+    return await asyncio.get_running_loop().run_in_executor(None, embed_query, text)
@@ -0,0 +1,126 @@
+"""Shared helpers for LLM calls made by the deep research agent."""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import json
+import os
+from collections import Counter, OrderedDict
+from typing import Any, Optional
+
+from agentfield.logger import log_warn
+
+# Upper bound on concurrent router.ai(...) requests across all reasoners
+LLM_MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", "64"))
+# Created on first use so it binds to the loop that serves requests (uvicorn,
+# possibly uvloop) rather than whatever loop existed at import time
+_llm_sem: Optional[asyncio.Semaphore] = None
+
+# Deadline for one router.ai(...) attempt (0 disables), and how many times a
+# timed-out attempt is retried with exponential backoff before giving up
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+LLM_TIMEOUT_RETRIES = int(os.getenv("LLM_TIMEOUT_RETRIES", "2"))
+_BACKOFF_BASE = 1.0
+# Timeout/retry counts for tuning the two settings above
+llm_call_stats: Counter = Counter()
+
+# Keep memoized_ai answers across runs; off by default so every research run
+# samples its task refinements afresh
+AI_CACHE_ENABLED = os.getenv("AI_CACHE_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+# Memoized responses (or in-flight requests) keyed by prompt + schema
+AI_CACHE_MAXSIZE = 4096
+_ai_cache: "OrderedDict[str, asyncio.Future]" = OrderedDict()
+
+
+async def limited_ai(router: Any, *args: Any, **kwargs: Any) -> Any:
+    """
+    Call ``router.ai`` while holding a slot of the shared in-flight limit.
+
+    Each attempt is bounded by LLM_TIMEOUT so one stuck request can't stall a
+    whole gather. Timed-out attempts back off without holding a slot; the last
+    ``asyncio.TimeoutError`` propagates to the caller's usual error handling.
+    """
+    global _llm_sem
+    if _llm_sem is None:
+        _llm_sem = asyncio.Semaphore(LLM_MAX_INFLIGHT)
+    timeout = LLM_TIMEOUT if LLM_TIMEOUT > 0 else None
+    # AgentRouter.ai resolves through __getattr__ onto the attached agent;
+    # look it up once rather than on every attempt
+    ai = router.ai
+    for attempt in range(LLM_TIMEOUT_RETRIES + 1):
+        try:
+            async with _llm_sem:
+                return await asyncio.wait_for(ai(*args, **kwargs), timeout)
+        except asyncio.TimeoutError:
+            llm_call_stats["timeouts"] += 1
+            if attempt == LLM_TIMEOUT_RETRIES:
+                raise
+            llm_call_stats["retries"] += 1
+            log_warn(
+                f"LLM call timed out after {LLM_TIMEOUT:.0f}s, "
+                f"retrying ({attempt + 1}/{LLM_TIMEOUT_RETRIES})"
+            )
+            await asyncio.sleep(_BACKOFF_BASE * 2**attempt)
+
+
+def _ai_cache_key(router: Any, args: tuple, kwargs: dict) -> str:
+    payload = {
+        "router": getattr(router, "prefix", ""),
+        "args": args,
+        **{
+            key: value.__name__ if key == "schema" else value
+            for key, value in kwargs.items()
+        },
+    }
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+async def _single_flight(
+    cache: "OrderedDict[str, asyncio.Future]", key: str, make_call: Any
+) -> Any:
+    """Await the cached (or in-flight) response for ``key``, calling once on a miss."""
+    future = cache.get(key)
+    if future is None:
+        future = asyncio.ensure_future(make_call())
+        cache[key] = future
+        if len(cache) > AI_CACHE_MAXSIZE:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(key)
+
+    try:
+        # Shield so one cancelled caller doesn't cancel the shared request
+        result = await asyncio.shield(future)
+    except Exception:
+        if cache.get(key) is future:
+            del cache[key]
+        raise
+    return copy.deepcopy(result)
+
+
+async def memoized_ai(router: Any, *args: Any, **kwargs: Any) -> Any:
+    """
+    Memoized ``limited_ai`` for calls whose answer depends only on the prompt.
+
+    Single-flight: concurrent callers with the same prompt and schema await
+    the first caller's request instead of firing a duplicate. Failed calls
+    are evicted so the next caller retries. Each caller receives its own
+    copy of the response, so mutating it is safe.
+
+    Answers live for the whole process, so this is a plain ``limited_ai``
+    call unless ``AI_CACHE_ENABLED`` is set.
+    """
+    if not AI_CACHE_ENABLED:
+        return await limited_ai(router, *args, **kwargs)
+    key = _ai_cache_key(router, args, kwargs)
+    return await _single_flight(
+        _ai_cache, key, lambda: limited_ai(router, *args, **kwargs)
+    )
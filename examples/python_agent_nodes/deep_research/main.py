@@ -2,18 +2,29 @@
 
 from __future__ import annotations
 
+import asyncio
 import os
 from pathlib import Path
 import sys
 
 from agentfield import AIConfig, Agent
+from agentfield.logger import log_info
+
+try:  # Optional: libuv event loop for the LLM fan-out heavy workloads
+    import uvloop
+except ImportError:
+    uvloop = None
 
 if __package__ in (None, ""):
     current_dir = Path(__file__).resolve().parent
     if str(current_dir) not in sys.path:
         sys.path.insert(0, str(current_dir))
 
+from embedding import embed_query
+from llm_utils import LLM_MAX_INFLIGHT
+from plan_cache import PLAN_CACHE_ENABLED
 from routers import planning_router, research_router
+from stage_memory import STAGE_MEMORY_ENABLED
 
 app = Agent(
     node_id="deep-research",
@@ -27,7 +38,20 @@ app.include_router(planning_router)
 app.include_router(research_router)
 
 
+def _warmup_embeddings() -> None:
+    """Load the embedding model up front when a semantic cache will need it."""
+    if not (PLAN_CACHE_ENABLED or STAGE_MEMORY_ENABLED):
+        return
+    try:
+        embed_query("deep-research warmup")
+        log_info("FastEmbed model warmed up for deep research")
+    except Exception as exc:  # pragma: no cover - best-effort
+        log_info(f"FastEmbed warmup failed: {exc}")
+
+
 if __name__ == "__main__":
+    _warmup_embeddings()
+
     print("🔬 Deep Research Agent")
     print("🧠 Node ID: deep-research")
     print(f"🌐 Control Plane: {app.agentfield_server}")
@@ -43,6 +67,12 @@ if __name__ == "__main__":
     print("  - Web search integration (Tavily)")
     print("  - Citation tracking and structured findings")
     print("  - Elegant and simple AgentField primitives")
+    print(f"\n⚙️  Max in-flight LLM calls: {LLM_MAX_INFLIGHT} (LLM_MAX_INFLIGHT)")
+
+    if uvloop is not None:
+        # Also covers CLI-mode runs; serve() already prefers uvloop when present
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    print(f"🔁 Event loop: {'uvloop' if uvloop is not None else 'asyncio'}")
 
     port_env = os.getenv("PORT")
     if port_env is None:
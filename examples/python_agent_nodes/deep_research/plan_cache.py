@@ -0,0 +1,90 @@
+"""Semantic cache of research plans keyed by question embedding.
+
+Plans are stored as AgentField memory vectors so every deep-research node
+that talks to the same control plane shares one cache.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from typing import Optional
+
+from agentfield.logger import log_info, log_warn
+
+from embedding import aembed_query
+from schemas import ResearchPlan
+
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+PLAN_CACHE_THRESHOLD = float(os.getenv("PLAN_CACHE_THRESHOLD", "0.90"))
+
+_KIND = "deep_research_plan"
+
+
+def _plan_shape(max_depth: int, max_tasks_per_level: int) -> str:
+    # Filters are compared as strings by the control plane
+    return f"{max_depth}x{max_tasks_per_level}"
+
+
+class PlanCache:
+    """Look up and store research plans for semantically similar questions."""
+
+    def __init__(self, router, threshold: float = PLAN_CACHE_THRESHOLD):
+        self.router = router
+        self.threshold = threshold
+
+    async def lookup(
+        self, research_question: str, max_depth: int, max_tasks_per_level: int
+    ) -> Optional[ResearchPlan]:
+        """Return the nearest cached plan if it clears the similarity threshold."""
+        try:
+            hits = await self.router.memory.global_scope.similarity_search(
+                query_embedding=await aembed_query(research_question),
+                top_k=1,
+                filters={
+                    "kind": _KIND,
+                    "plan_shape": _plan_shape(max_depth, max_tasks_per_level),
+                },
+            )
+        except Exception as e:
+            log_warn(f"Plan cache lookup failed: {e}")
+            return None
+
+        if not hits or float(hits[0].get("score", 0.0)) < self.threshold:
+            return None
+
+        metadata = hits[0].get("metadata", {})
+        plan_json = metadata.get("plan_json")
+        if not plan_json:
+            return None
+
+        log_info(
+            f"Plan cache hit ({float(hits[0]['score']):.3f}) for "
+            f"'{metadata.get('research_question', '')}'"
+        )
+        plan = ResearchPlan.model_validate_json(plan_json)
+        plan.research_question = research_question
+        return plan
+
+    async def store(
+        self, plan: ResearchPlan, max_depth: int, max_tasks_per_level: int
+    ) -> None:
+        """Insert a completed plan so similar questions can reuse it."""
+        digest = hashlib.sha256(plan.research_question.encode()).hexdigest()[:16]
+        try:
+            await self.router.memory.global_scope.set_vector(
+                key=f"{_KIND}:{digest}",
+                embedding=await aembed_query(plan.research_question),
+                metadata={
+                    "kind": _KIND,
+                    "plan_shape": _plan_shape(max_depth, max_tasks_per_level),
+                    "research_question": plan.research_question,
+                    "plan_json": plan.model_dump_json(),
+                },
+            )
+        except Exception as e:
+            log_warn(f"Plan cache store failed: {e}")
@@ -3,24 +3,210 @@
 from __future__ import annotations
 
 import asyncio
-from typing import List
+import hashlib
+from typing import Dict, List, Set, Tuple
 
 from agentfield import AgentRouter
-
+from agentfield.logger import log_warn
+
+try:  # Stdlib from Python 3.9; 3.8 uses the Kahn fallback in _ready_levels
+    from graphlib import CycleError, TopologicalSorter
+except ImportError:  # pragma: no cover - Python 3.8
+    TopologicalSorter = None
+
+from dep_cache import (
+    DEP_CACHE_ENABLED,
+    dependency_cache_key,
+    load_dependencies,
+    store_dependencies,
+)
+from llm_utils import limited_ai, memoized_ai
+from plan_cache import PLAN_CACHE_ENABLED, PlanCache
 from schemas import (
     ResearchPlan,
     ResearchReport,
     SearchStrategy,
     Subtask,
+    SubtaskList,
     TaskDescriptions,
     TaskDependenciesList,
     TaskMergeList,
     TaskResult,
 )
+from stage_memory import (
+    STAGE_MEMORY_ENABLED,
+    StageMemory,
+    format_examples,
+    score_refinement,
+)
+
+# Import reasoners from other routers
+from .research import (
+    answer_parent_task,
+    execute_research_task,
+    execute_research_task_with_context,
+    synthesize_from_dependencies,
+    task_result_from_dependencies,
+)
 
 
 planning_router = AgentRouter(prefix="planning")
 
+# Per-call values are appended after these so each prompt starts with the same
+# bytes on every call, which provider-side prefix caching can reuse
+_INITIAL_PLAN_SYSTEM_PROMPT = (
+    "You are an expert research planner breaking down questions into a hierarchical task graph.\n\n"
+    "## PHILOSOPHY\n"
+    "You are creating two types of tasks:\n"
+    "1. **Leaf tasks** (no dependencies) = Specific questions that need web search\n"
+    "   - These are atomic research questions answerable via web search\n"
+    "   - Example: 'What is AgentField?' or 'What are AgentField's features?'\n\n"
+    "2. **Parent tasks** (have dependencies) = Questions answered by synthesizing children\n"
+    "   - These combine answers from child tasks\n"
+    "   - Example: 'Summarize AgentField' depends on 'What is AgentField?' and 'What are features?'\n\n"
+    "## CRITICAL: DISTINCT TASKS\n"
+    "Each task must be DISTINCT and NON-OVERLAPPING.\n"
+    "- Do NOT create tasks that ask the same question in different words\n"
+    "- Each task should cover a unique aspect or angle\n"
+    "- Avoid redundancy - if two tasks would find the same information, merge them\n\n"
+    "## DEPENDENCY MEANING\n"
+    "A task depends on another if it needs that task's ANSWER to proceed.\n"
+    "Dependencies mean: 'I need answers from those tasks to answer this.'\n\n"
+    "## YOUR TASK\n"
+    "Break the research question into 3-5 DISTINCT major research areas.\n"
+    "Each area should be a specific, searchable question (leaf task).\n"
+    "Ensure each task is unique and non-overlapping.\n"
+    "These will be refined recursively, and synthesis tasks will be created later.\n\n"
+)
+
+_FUSED_PLAN_SYSTEM_PROMPT = (
+    "You are an expert research planner producing a complete hierarchical task graph in one pass.\n\n"
+    "## TWO TYPES OF TASKS\n"
+    "1. **Leaf tasks** (no dependencies) = Specific questions that need web search\n"
+    "   - Example: 'What is AgentField?' or 'What are AgentField's features?'\n\n"
+    "2. **Parent tasks** (have dependencies) = Questions answered by synthesizing children\n"
+    "   - Example: 'Summarize AgentField' depends on 'What is AgentField?' and 'What are features?'\n\n"
+    "## CRITICAL: DISTINCT TASKS\n"
+    "- Do NOT create tasks that ask the same question in different words\n"
+    "- Each task should cover a unique aspect or angle\n"
+    "- If two tasks would find the same information, merge them\n\n"
+    "## DEPENDENCY MEANING\n"
+    "A task depends on another only if it needs that task's ANSWER to proceed.\n"
+    "Be conservative - only mark dependencies when clearly needed.\n\n"
+    "## YOUR TASK\n"
+    "Return every task in the graph with:\n"
+    "- task_id: hierarchical id like 'task_1', 'task_1_2'\n"
+    "- description: a clear, specific research question\n"
+    "- dependencies: task_ids whose answers this task needs (empty for leaf tasks)\n"
+)
+
+_REFINE_SYSTEM_PROMPT = (
+    "You are a task decomposition expert. Break down research tasks into "
+    "smaller subtasks.\n\n"
+    "## CRITICAL: DISTINCT SUBTASKS\n"
+    "When breaking down, create DISTINCT, NON-OVERLAPPING subtasks:\n"
+    "- Each subtask should cover a unique aspect\n"
+    "- Do NOT create subtasks that ask the same question\n"
+    "- Ensure each subtask is independently researchable\n\n"
+    "Return ONLY a JSON object with a 'descriptions' array.\n"
+    "- If the task is specific enough, return it as a single-item array\n"
+    "- If it needs breakdown, return 2-4 DISTINCT smaller task descriptions\n"
+    "- Each description must be unique and non-overlapping\n\n"
+)
+
+# Part of the dependency cache key; bump it whenever the dependency prompt
+# changes so cached graphs from the old prompt stop matching
+_DEPENDENCY_PROMPT_VERSION = 1
+
+_DEPENDENCY_SYSTEM_PROMPT = (
+    "You are a dependency analysis expert identifying task relationships.\n\n"
+    "## DEPENDENCY PHILOSOPHY\n"
+    "A task depends on another if it needs that task's ANSWER to proceed.\n"
+    "Dependencies mean: 'I need answers from those tasks to answer this.'\n\n"
+    "## CRITICAL: AVOID REDUNDANT DEPENDENCIES\n"
+    "- Do NOT mark dependencies if tasks ask the same question\n"
+    "- Do NOT mark dependencies if a task can be answered independently\n"
+    "- Only mark dependencies when a task truly needs another task's answer\n"
+    "- If two tasks would find the same information, they should NOT depend on each other\n\n"
+    "## DEPENDENCY PATTERNS\n"
+    "- **Comparison tasks** depend on individual research tasks\n"
+    "  Example: 'Compare X and Y' depends on 'What is X?' and 'What is Y?'\n\n"
+    "- **Synthesis tasks** depend on all component tasks\n"
+    "  Example: 'Summarize AgentField' depends on 'What is AgentField?' and 'What are features?'\n\n"
+    "- **Analysis tasks** depend on data-gathering tasks\n"
+    "  Example: 'Analyze trends' depends on 'What are the trends?'\n\n"
+    "## KEY PRINCIPLE\n"
+    "If a task can be answered by combining other tasks' findings, mark dependencies.\n"
+    "Leaf tasks (no dependencies) will be answered via web search.\n"
+    "Parent tasks (have dependencies) will synthesize from children's answers.\n\n"
+    "Return ONLY a JSON object with a 'dependencies' array. Each item:\n"
+    "- task_id: the task ID\n"
+    "- depends_on: array of task IDs it depends on (empty if independent/leaf task)\n\n"
+    "Be conservative - only mark dependencies when clearly needed. "
+    "Avoid redundant dependencies between similar tasks."
+)
+
+_DEDUP_SYSTEM_PROMPT = (
+    "You are a task deduplication expert. Identify tasks that are redundant or ask the same question.\n\n"
+    "## YOUR TASK\n"
+    "Find tasks that:\n"
+    "- Ask the same question in different words\n"
+    "- Cover the same information/research area\n"
+    "- Are essentially duplicates\n\n"
+    "For each group of similar tasks:\n"
+    "- Keep the most specific/clear task (keep_task_id)\n"
+    "- Mark others to merge (merge_task_ids)\n\n"
+    "## IMPORTANT\n"
+    "- Only merge tasks that are truly redundant\n"
+    "- Keep tasks that cover different aspects, even if related\n"
+    "- Be conservative - when in doubt, don't merge\n\n"
+    "Return ONLY a JSON object with a 'merges' array. "
+    "Each merge has keep_task_id and merge_task_ids."
+)
+
+_STRATEGY_SYSTEM_PROMPT = (
+    "You are a task strategy expert deciding how to answer a parent task.\n\n"
+    "## TWO STRATEGIES\n"
+    "1. **synthesize_only**: Can answer from children's findings alone\n"
+    "   - Example: 'Summarize X' when we have 'What is X?' and 'What are X's features?'\n"
+    "   - Example: 'List all features' when we have individual feature tasks\n\n"
+    "2. **enhanced_search**: Needs additional web search with dependency context\n"
+    "   - Example: 'Compare X to Y' when we have 'What is X?' but need Y info\n"
+    "   - Example: 'Analyze market trends' when we have data but need external context\n"
+    "   - Example: 'Find competitors' when we have product info but need market research\n\n"
+    "## DECISION CRITERIA\n"
+    "- If the task asks for information NOT in children → enhanced_search\n"
+    "- If the task can be answered by combining children → synthesize_only\n"
+    "- If the task needs external context/comparison → enhanced_search\n"
+    "- If the task is pure synthesis/summary → synthesize_only\n\n"
+    "Return ONLY a JSON object with 'strategy' ('synthesize_only' or 'enhanced_search') "
+    "and 'reasoning' (brief explanation)."
+)
+
+_FINAL_SYNTHESIS_SYSTEM_PROMPT = (
+    "You are a research synthesis expert creating a comprehensive final report.\n\n"
+    "## CONTEXT\n"
+    "You are synthesizing findings from multiple research tasks into a final report.\n"
+    "Each task has been answered (either via web search for leaf tasks, or "
+    "synthesis for parent tasks).\n\n"
+    "## YOUR TASK\n"
+    "Create a comprehensive research report that:\n"
+    "1. Provides an executive summary answering the main research question\n"
+    "2. Organizes detailed findings by topic/theme\n"
+    "3. Draws conclusions and key insights\n"
+    "4. Assesses overall confidence based on all task findings\n\n"
+    "Structure the report clearly and comprehensively."
+)
+
+# Fused DAG plans whose descriptions average fewer characters than this are
+# treated as too coarse and replanned through the recursive path
+_MIN_AVG_DESCRIPTION_CHARS = 40
+
+
+def _content_id(description: str) -> str:
+    """Short stable hash of a task description, used in refined task IDs."""
+    return hashlib.blake2b(description.encode(), digest_size=6).hexdigest()
+
 
 def _build_topological_groups(tasks: List[Subtask]) -> List[List[str]]:
     """
@@ -30,34 +216,88 @@ def _build_topological_groups(tasks: List[Subtask]) -> List[List[str]]:
     can run in parallel. Returns list of groups, where each group
     contains task IDs that can execute in parallel.
     """
-    task_map = {task.task_id: task for task in tasks}
+    # Return groups with more than one task (parallelizable)
+    return [group for group in _get_execution_levels(tasks) if len(group) > 1]
 
-    # Calculate in-degree for each task (how many dependencies it has)
-    in_degree = {task_id: len(task.dependencies) for task_id, task in task_map.items()}
 
-    # Topological sort - group by level
-    level_groups: List[List[str]] = []
-    remaining = set(task_map.keys())
+def _find_cycle(graph: Dict[str, List[str]]) -> List[str]:
+    """
+    Return one dependency cycle, or an empty list if the graph is acyclic.
 
-    while remaining:
-        # Find all tasks with no remaining dependencies (current level)
-        current_level = [task_id for task_id in remaining if in_degree[task_id] == 0]
+    Iterative DFS with white/grey/black colouring. In the returned cycle each
+    task depends on the next one and the last task depends on the first.
+    """
+    white, grey, black = 0, 1, 2
+    color = dict.fromkeys(graph, white)
+
+    for root in sorted(graph):
+        if color[root] != white:
+            continue
+        color[root] = grey
+        path = [root]
+        stack = [iter(graph[root])]
+        while stack:
+            for dep in stack[-1]:
+                if color[dep] == grey:
+                    return path[path.index(dep) :]
+                if color[dep] == white:
+                    color[dep] = grey
+                    path.append(dep)
+                    stack.append(iter(graph[dep]))
+                    break
+            else:
+                color[path.pop()] = black
+                stack.pop()
 
-        if not current_level:
-            # Circular dependency or error - add remaining tasks
-            current_level = list(remaining)
+    return []
 
-        level_groups.append(current_level)
-        remaining -= set(current_level)
 
-        # Decrease in-degree for tasks that depend on current level
+def _ready_levels(graph: Dict[str, List[str]]) -> List[List[str]]:
+    """
+    Execution levels of every task in ``graph`` (task -> dependencies) that
+    no cycle blocks, in the order ``graphlib.TopologicalSorter`` yields them.
+    """
+    levels: List[List[str]] = []
+    if TopologicalSorter is not None:
+        sorter = TopologicalSorter(graph)
+        try:
+            sorter.prepare()
+        except CycleError:
+            # Still drain every task the cycle doesn't block
+            pass
+
+        # Bound-method aliases keep attribute lookups out of the drain loop
+        is_active, get_ready, done = sorter.is_active, sorter.get_ready, sorter.done
+        add_level = levels.append
+        while is_active():
+            current_level = list(get_ready())
+            add_level(current_level)
+            done(*current_level)
+        return levels
+
+    # Python 3.8: Kahn's algorithm over a children-of map, visiting edges in
+    # the same order as TopologicalSorter so both give identical levels
+    in_degree: Dict[str, int] = {}
+    children: Dict[str, List[str]] = {}
+    for task_id, deps in graph.items():
+        # Tasks are ordered by first mention, dependency or not, as in graphlib
+        in_degree[task_id] = in_degree.get(task_id, 0) + len(deps)
+        children.setdefault(task_id, [])
+        for dep in deps:
+            in_degree.setdefault(dep, 0)
+            children.setdefault(dep, []).append(task_id)
+
+    current_level = [task_id for task_id, degree in in_degree.items() if degree == 0]
+    while current_level:
+        levels.append(current_level)
+        next_level = []
         for task_id in current_level:
-            for dep_task in tasks:
-                if task_id in dep_task.dependencies and dep_task.task_id in remaining:
-                    in_degree[dep_task.task_id] -= 1
-
-    # Return groups with more than one task (parallelizable)
-    return [group for group in level_groups if len(group) > 1]
+            for child_id in children[task_id]:
+                in_degree[child_id] -= 1
+                if in_degree[child_id] == 0:
+                    next_level.append(child_id)
+        current_level = next_level
+    return levels
 
 
 def _get_execution_levels(tasks: List[Subtask]) -> List[List[str]]:
@@ -67,34 +307,49 @@ def _get_execution_levels(tasks: List[Subtask]) -> List[List[str]]:
     Returns ALL levels (not just parallelizable groups).
     Level 0 = leaf tasks (no dependencies, need search)
     Level 1+ = parent tasks (have dependencies, synthesize from children)
-    """
-    task_map = {task.task_id: task for task in tasks}
 
-    # Calculate in-degree for each task
-    in_degree = {task_id: len(task.dependencies) for task_id, task in task_map.items()}
+    Levels come from ``_ready_levels`` (``graphlib.TopologicalSorter`` where
+    available). Circular dependencies are repaired by dropping one edge per
+    cycle, the one pointing to the cycle's lexicographically smallest task
+    (the task that depends on it stops waiting for it), then sorting resumes.
+    """
+    task_ids = {task.task_id: None for task in tasks}
+    graph = {
+        task.task_id: [dep for dep in task.dependencies if dep in task_ids]
+        for task in tasks
+    }
 
     # Topological sort - group by level
     level_groups: List[List[str]] = []
-    remaining = set(task_map.keys())
-
-    while remaining:
-        # Find all tasks with no remaining dependencies (current level)
-        current_level = [task_id for task_id in remaining if in_degree[task_id] == 0]
-
-        if not current_level:
-            # Circular dependency or error - add remaining tasks
-            current_level = list(remaining)
-
-        level_groups.append(current_level)
-        remaining -= set(current_level)
-
-        # Decrease in-degree for tasks that depend on current level
-        for task_id in current_level:
-            for dep_task in tasks:
-                if task_id in dep_task.dependencies and dep_task.task_id in remaining:
-                    in_degree[dep_task.task_id] -= 1
-
-    return level_groups
+    scheduled: Set[str] = set()
+
+    while True:
+        for current_level in _ready_levels(graph):
+            level_groups.append(current_level)
+            scheduled.update(current_level)
+
+        # Acyclic graphs finish here without another pass over the tasks
+        if len(scheduled) == len(task_ids):
+            return level_groups
+
+        remaining = [task_id for task_id in task_ids if task_id not in scheduled]
+
+        # Only cycles (and tasks behind them) are left; already-scheduled
+        # dependencies are satisfied
+        remaining_ids = set(remaining)
+        graph = {
+            task_id: [dep for dep in graph[task_id] if dep in remaining_ids]
+            for task_id in remaining
+        }
+        cycle = _find_cycle(graph)
+        # cycle[i] depends on cycle[i + 1]; drop the edge into the smallest id
+        smallest = cycle.index(min(cycle))
+        task_id, dropped = cycle[smallest - 1], cycle[smallest]
+        log_warn(
+            f"Circular dependency {' -> '.join(cycle + cycle[:1])}: "
+            f"dropping {task_id} -> {dropped}"
+        )
+        graph[task_id] = [dep for dep in graph[task_id] if dep != dropped]
 
 
 @planning_router.reasoner()
@@ -109,33 +364,38 @@ async def create_research_plan(
     This reasoner recursively decomposes a research question into smaller,
     manageable subtasks, forming a topological graph that can be executed
     in parallel where dependencies allow.
+
+    When ``PLAN_CACHE_ENABLED`` is set, a plan cached for a semantically
+    similar question is reused instead of replanning from scratch. When
+    ``STAGE_MEMORY_ENABLED`` is set, good refinements are recorded so later
+    ``refine_task`` calls can use them as examples.
     """
+    plan_cache = PlanCache(planning_router) if PLAN_CACHE_ENABLED else None
+    if plan_cache is not None:
+        cached_plan = await plan_cache.lookup(
+            research_question, max_depth, max_tasks_per_level
+        )
+        if cached_plan is not None:
+            return cached_plan
+
+    # Shallow plans: one fused call returns descriptions and dependencies together
+    if max_depth <= 2:
+        fused_plan = await plan_full_dag(
+            research_question=research_question,
+            max_depth=max_depth,
+            max_tasks_per_level=max_tasks_per_level,
+        )
+        if not _is_too_coarse(fused_plan.tasks):
+            if plan_cache is not None:
+                await plan_cache.store(fused_plan, max_depth, max_tasks_per_level)
+            return fused_plan
+
     # First, get initial breakdown from LLM - simplified to just descriptions
-    initial_response = await planning_router.ai(
+    initial_response = await limited_ai(
+        planning_router,
         system=(
-            "You are an expert research planner breaking down questions into a hierarchical task graph.\n\n"
-            "## PHILOSOPHY\n"
-            "You are creating two types of tasks:\n"
-            "1. **Leaf tasks** (no dependencies) = Specific questions that need web search\n"
-            "   - These are atomic research questions answerable via web search\n"
-            "   - Example: 'What is AgentField?' or 'What are AgentField's features?'\n\n"
-            "2. **Parent tasks** (have dependencies) = Questions answered by synthesizing children\n"
-            "   - These combine answers from child tasks\n"
-            "   - Example: 'Summarize AgentField' depends on 'What is AgentField?' and 'What are features?'\n\n"
-            "## CRITICAL: DISTINCT TASKS\n"
-            "Each task must be DISTINCT and NON-OVERLAPPING.\n"
-            "- Do NOT create tasks that ask the same question in different words\n"
-            "- Each task should cover a unique aspect or angle\n"
-            "- Avoid redundancy - if two tasks would find the same information, merge them\n\n"
-            "## DEPENDENCY MEANING\n"
-            "A task depends on another if it needs that task's ANSWER to proceed.\n"
-            "Dependencies mean: 'I need answers from those tasks to answer this.'\n\n"
-            "## YOUR TASK\n"
-            "Break the research question into 3-5 DISTINCT major research areas.\n"
-            "Each area should be a specific, searchable question (leaf task).\n"
-            "Ensure each task is unique and non-overlapping.\n"
-            "These will be refined recursively, and synthesis tasks will be created later.\n\n"
-            f"Maximum {max_tasks_per_level} tasks.\n\n"
+            _INITIAL_PLAN_SYSTEM_PROMPT
+            + f"Maximum {max_tasks_per_level} tasks.\n\n"
             "Return ONLY a JSON object with a 'descriptions' array."
         ),
         user=(
@@ -158,101 +418,105 @@ async def create_research_plan(
         for idx, desc in enumerate(initial_response.descriptions)
     ]
 
-    # Recursively refine each task
-    all_tasks: List[Subtask] = []
+    # Refine as a work queue: a task's children start refining as soon as its
+    # own refinement returns, instead of waiting for the slowest task of its
+    # depth. Each entry carries its tree position so the final order is stable.
+    leaves: List[Tuple[Tuple[int, ...], Subtask]] = []
+    refinements: List[Tuple[str, List[str]]] = []
+    pending: Dict[asyncio.Future, Tuple[Tuple[int, ...], Subtask]] = {}
 
-    async def refine_recursively(
-        task: Subtask, parent_context: str = ""
-    ) -> List[Subtask]:
-        """Recursively refine a task by calling the refine_task reasoner."""
+    def schedule(position: Tuple[int, ...], task: Subtask, parent_context: str) -> None:
         if task.depth >= max_depth:
-            # Base case: task is specific enough
-            return [task]
-
-        # Directly call the refine_task reasoner - this creates a workflow node
-        refined_tasks = await refine_task(
-            task_description=task.description,
-            parent_context=parent_context or research_question,
-            current_depth=task.depth,
-            max_depth=max_depth,
-        )
-
-        # Update task IDs to maintain hierarchy and recursively refine
-        result_tasks: List[Subtask] = []
-        for idx, refined_task in enumerate(refined_tasks):
-            new_task_id = f"{task.task_id}_{idx + 1}"
-            new_task = Subtask(
-                task_id=new_task_id,
-                description=refined_task.description,
-                dependencies=refined_task.dependencies,
-                depth=task.depth + 1,
-                can_parallelize=len(refined_task.dependencies) == 0,
+            # Base case: tasks at max depth are specific enough
+            leaves.append((position, task))
+            return
+        # Directly call the refine_task reasoner - each call creates a workflow node
+        future = asyncio.ensure_future(
+            refine_task(
+                task_description=task.description,
+                parent_context=parent_context or research_question,
+                current_depth=task.depth,
+                max_depth=max_depth,
             )
-
-            # Recursively refine if still not at max depth
-            if new_task.depth < max_depth:
-                further_refined = await refine_recursively(new_task, task.description)
-                result_tasks.extend(further_refined)
-            else:
-                result_tasks.append(new_task)
-
-        # If no refinement happened, return the original task
-        return result_tasks if result_tasks else [task]
-
-    # Refine initial tasks - can run in parallel since they're independent
-    refinement_tasks = [
-        refine_recursively(initial_task, research_question)
-        for initial_task in initial_plan
-    ]
-    refined_results = await asyncio.gather(*refinement_tasks)
-
-    # Flatten the results
-    for refined_list in refined_results:
-        all_tasks.extend(refined_list)
+        )
+        pending[future] = (position, task)
+
+    for idx, initial_task in enumerate(initial_plan):
+        schedule((idx,), initial_task, research_question)
+
+    try:
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                position, task = pending.pop(future)
+                refined_tasks = future.result()
+                if not refined_tasks:
+                    # If no refinement happened, keep the original task
+                    leaves.append((position, task))
+                    continue
+
+                refinements.append(
+                    (task.description, [t.description for t in refined_tasks])
+                )
+
+                # Content-based IDs keep the hierarchy and stay identical
+                # across runs for identical refinements, so caches keyed on
+                # task IDs (dependency cache, plan cache) keep hitting
+                for idx, refined_task in enumerate(refined_tasks):
+                    child_id = _content_id(refined_task.description)
+                    new_task = Subtask(
+                        task_id=f"{task.task_id}_{child_id}",
+                        description=refined_task.description,
+                        dependencies=refined_task.dependencies,
+                        depth=task.depth + 1,
+                        can_parallelize=len(refined_task.dependencies) == 0,
+                    )
+                    schedule(position + (idx,), new_task, task.description)
+    except BaseException:
+        for future in pending:
+            future.cancel()
+        raise
+
+    all_tasks = [task for _, task in sorted(leaves, key=lambda leaf: leaf[0])]
 
     # Deduplicate similar/redundant tasks
-    tasks_for_dedup = [
-        {"task_id": task.task_id, "description": task.description} for task in all_tasks
-    ]
-    merge_response = await deduplicate_tasks(tasks_for_dedup, research_question)
+    merge_response = await deduplicate_tasks(all_tasks, research_question)
 
-    # Apply merges: keep the keep_task_id, remove merge_task_ids, update dependencies
+    # Apply merges: keep the keep_task_id, remove merge_task_ids, update dependencies.
+    # Build one merged -> kept mapping, then rewrite every task's
+    # dependencies in a single pass instead of once per merge.
     task_map = {task.task_id: task for task in all_tasks}
-    tasks_to_remove = set()
-
+    merged_into: Dict[str, str] = {}
     for merge in merge_response.merges:
         if merge.keep_task_id in task_map:
-            # Update dependencies: if any task depends on a merged task, point to kept task
-            for task in all_tasks:
-                if merge.keep_task_id != task.task_id:
-                    # Replace merged task IDs with kept task ID in dependencies
-                    if merge.keep_task_id in task.dependencies:
-                        # Already depends on kept task, remove merged ones
-                        task.dependencies = [
-                            dep
-                            for dep in task.dependencies
-                            if dep not in merge.merge_task_ids
-                        ]
-                    else:
-                        # Replace merged task IDs with kept task ID
-                        task.dependencies = [
-                            merge.keep_task_id if dep in merge.merge_task_ids else dep
-                            for dep in task.dependencies
-                        ]
-
-            # Mark merged tasks for removal
-            tasks_to_remove.update(merge.merge_task_ids)
+            for merged_id in merge.merge_task_ids:
+                if merged_id != merge.keep_task_id:
+                    merged_into[merged_id] = merge.keep_task_id
+    tasks_to_remove = set(merged_into)
+
+    def surviving_id(task_id: str) -> str:
+        # Follow chains (a merged into b, b merged into c); stop on a loop
+        seen = set()
+        while task_id in merged_into and task_id not in seen:
+            seen.add(task_id)
+            task_id = merged_into[task_id]
+        return task_id
+
+    if merged_into:
+        for task in all_tasks:
+            # Point dependencies on merged tasks at the kept task, without
+            # duplicates or a task depending on itself
+            task.dependencies = [
+                dep
+                for dep in dict.fromkeys(surviving_id(dep) for dep in task.dependencies)
+                if dep != task.task_id
+            ]
 
     # Remove merged tasks
     all_tasks = [task for task in all_tasks if task.task_id not in tasks_to_remove]
 
     # Identify dependencies between tasks
-    tasks_for_analysis = [
-        {"task_id": task.task_id, "description": task.description} for task in all_tasks
-    ]
-    dependencies_response = await identify_dependencies(
-        tasks_for_analysis, research_question
-    )
+    dependencies_response = await identify_dependencies(all_tasks, research_question)
 
     # Update task dependencies
     task_map = {task.task_id: task for task in all_tasks}
@@ -270,7 +534,7 @@ async def create_research_plan(
     # Build topological groups using topological sort
     parallelizable_groups = _build_topological_groups(all_tasks)
 
-    return ResearchPlan(
+    plan = ResearchPlan(
         research_question=research_question,
         tasks=all_tasks,
         max_depth=max(task.depth for task in all_tasks) if all_tasks else 0,
@@ -278,6 +542,86 @@ async def create_research_plan(
         parallelizable_groups=parallelizable_groups,
     )
 
+    # The cache writes are independent; issue them as one fan-out. Each store
+    # logs and swallows its own failure, so none can cancel the others.
+    # (gather, not asyncio.TaskGroup: TaskGroup is 3.11+ and these examples
+    # keep the SDK's Python 3.8 floor.)
+    writes = []
+    if plan_cache is not None:
+        writes.append(plan_cache.store(plan, max_depth, max_tasks_per_level))
+    if STAGE_MEMORY_ENABLED and refinements:
+        stage_memory = StageMemory(planning_router)
+        writes.extend(
+            stage_memory.store(description, children, score_refinement(children))
+            for description, children in refinements
+        )
+    if writes:
+        await asyncio.gather(*writes)
+
+    return plan
+
+
+def _is_too_coarse(tasks: List[Subtask]) -> bool:
+    """Cheap post-check for fused plans that came back under-specified."""
+    if len(tasks) < 2:
+        return True
+    avg_length = sum(len(task.description) for task in tasks) / len(tasks)
+    return avg_length < _MIN_AVG_DESCRIPTION_CHARS
+
+
+@planning_router.reasoner()
+async def plan_full_dag(
+    research_question: str,
+    max_depth: int = 2,
+    max_tasks_per_level: int = 5,
+) -> ResearchPlan:
+    """
+    Produce the complete task DAG in a single LLM call.
+
+    Fuses the initial breakdown, recursive refinement and dependency
+    identification into one request - used for shallow plans where the
+    whole hierarchy fits comfortably in one response.
+    """
+    response = await limited_ai(
+        planning_router,
+        system=(
+            _FUSED_PLAN_SYSTEM_PROMPT
+            + f"- depth: 1 for major research areas, up to {max_depth} for the most specific questions\n\n"
+            f"Use at most {max_tasks_per_level} tasks per depth level.\n\n"
+            "Return ONLY a JSON object with a 'tasks' array."
+        ),
+        user=(
+            f"Research Question: {research_question}\n\n"
+            f"Break this into a complete task graph of DISTINCT, searchable questions "
+            f"(maximum depth {max_depth}), with synthesis tasks depending on the tasks they combine. "
+            f"Return only the tasks array."
+        ),
+        schema=SubtaskList,
+    )
+
+    # Drop duplicate ids, then keep dependencies that point at real tasks
+    tasks: List[Subtask] = []
+    task_ids: Set[str] = set()
+    for task in response.tasks:
+        if task.task_id not in task_ids:
+            task_ids.add(task.task_id)
+            tasks.append(task)
+
+    for task in tasks:
+        task.dependencies = [
+            dep for dep in task.dependencies if dep in task_ids and dep != task.task_id
+        ]
+        task.depth = min(max(task.depth, 1), max_depth)
+        task.can_parallelize = len(task.dependencies) == 0
+
+    return ResearchPlan(
+        research_question=research_question,
+        tasks=tasks,
+        max_depth=max(task.depth for task in tasks) if tasks else 0,
+        total_tasks=len(tasks),
+        parallelizable_groups=_build_topological_groups(tasks),
+    )
+
 
 @planning_router.reasoner()
 async def refine_task(
@@ -305,22 +649,27 @@ async def refine_task(
             )
         ]
 
-    # Use AI to determine if task needs further breakdown - simplified schema
-    result_response = await planning_router.ai(
+    # Seed the prompt with prior decompositions of similar tasks
+    examples_section = ""
+    if STAGE_MEMORY_ENABLED:
+        examples = await StageMemory(planning_router).retrieve(task_description)
+        if examples:
+            examples_section = (
+                "\n\n## EXAMPLES OF GOOD DECOMPOSITIONS FOR SIMILAR TASKS\n"
+                f"{format_examples(examples)}\n"
+                "Adapt these where they fit; do not copy them blindly."
+            )
+
+    # Use AI to determine if task needs further breakdown - simplified schema.
+    # Memoized with AI_CACHE_ENABLED: sibling branches often ask for the
+    # same refinement.
+    result_response = await memoized_ai(
+        planning_router,
         system=(
-            "You are a task decomposition expert. Break down research tasks into "
-            "smaller subtasks.\n\n"
-            "## CRITICAL: DISTINCT SUBTASKS\n"
-            "When breaking down, create DISTINCT, NON-OVERLAPPING subtasks:\n"
-            "- Each subtask should cover a unique aspect\n"
-            "- Do NOT create subtasks that ask the same question\n"
-            "- Ensure each subtask is independently researchable\n\n"
-            "Return ONLY a JSON object with a 'descriptions' array.\n"
-            "- If the task is specific enough, return it as a single-item array\n"
-            "- If it needs breakdown, return 2-4 DISTINCT smaller task descriptions\n"
-            "- Each description must be unique and non-overlapping\n\n"
-            f"Current depth: {current_depth} of {max_depth}. "
+            _REFINE_SYSTEM_PROMPT
+            + f"Current depth: {current_depth} of {max_depth}. "
             f"Only break down if still too complex."
+            f"{examples_section}"
         ),
         user=(
             f"Task: {task_description}\n"
@@ -331,16 +680,17 @@ async def refine_task(
         schema=TaskDescriptions,
     )
 
-    # Build Subtask objects from descriptions
+    # Build Subtask objects from descriptions; repeated descriptions would
+    # collide on their content-based IDs, so keep the first of each
     refined_tasks = [
         Subtask(
-            task_id=f"subtask_{idx}",
+            task_id=f"subtask_{_content_id(desc)}",
             description=desc,
             dependencies=[],
             depth=current_depth + 1,
             can_parallelize=True,
         )
-        for idx, desc in enumerate(result_response.descriptions)
+        for desc in dict.fromkeys(result_response.descriptions)
     ]
 
     return refined_tasks
@@ -348,47 +698,35 @@ async def refine_task(
 
 @planning_router.reasoner()
 async def identify_dependencies(
-    tasks: List[dict], research_question: str
+    tasks: List[Subtask], research_question: str
 ) -> TaskDependenciesList:
     """
     Identify dependencies between tasks based on their descriptions.
 
     Takes a list of tasks with id and description, and identifies which
     tasks need results from other tasks before they can execute.
+    With ``DEP_CACHE_ENABLED``, results are cached on disk per (question,
+    task set, model, prompt version) fingerprint.
     """
+    if DEP_CACHE_ENABLED:
+        cache_key = dependency_cache_key(
+            tasks,
+            research_question,
+            planning_router.ai_config.model,
+            _DEPENDENCY_PROMPT_VERSION,
+        )
+        cached = load_dependencies(cache_key)
+        if cached is not None:
+            return cached
+
     # Format tasks for the prompt
     tasks_text = "\n".join(
-        f"- {task['task_id']}: {task['description']}" for task in tasks
+        f"- {task.task_id}: {task.description}" for task in tasks
     )
 
-    response = await planning_router.ai(
-        system=(
-            "You are a dependency analysis expert identifying task relationships.\n\n"
-            "## DEPENDENCY PHILOSOPHY\n"
-            "A task depends on another if it needs that task's ANSWER to proceed.\n"
-            "Dependencies mean: 'I need answers from those tasks to answer this.'\n\n"
-            "## CRITICAL: AVOID REDUNDANT DEPENDENCIES\n"
-            "- Do NOT mark dependencies if tasks ask the same question\n"
-            "- Do NOT mark dependencies if a task can be answered independently\n"
-            "- Only mark dependencies when a task truly needs another task's answer\n"
-            "- If two tasks would find the same information, they should NOT depend on each other\n\n"
-            "## DEPENDENCY PATTERNS\n"
-            "- **Comparison tasks** depend on individual research tasks\n"
-            "  Example: 'Compare X and Y' depends on 'What is X?' and 'What is Y?'\n\n"
-            "- **Synthesis tasks** depend on all component tasks\n"
-            "  Example: 'Summarize AgentField' depends on 'What is AgentField?' and 'What are features?'\n\n"
-            "- **Analysis tasks** depend on data-gathering tasks\n"
-            "  Example: 'Analyze trends' depends on 'What are the trends?'\n\n"
-            "## KEY PRINCIPLE\n"
-            "If a task can be answered by combining other tasks' findings, mark dependencies.\n"
-            "Leaf tasks (no dependencies) will be answered via web search.\n"
-            "Parent tasks (have dependencies) will synthesize from children's answers.\n\n"
-            "Return ONLY a JSON object with a 'dependencies' array. Each item:\n"
-            "- task_id: the task ID\n"
-            "- depends_on: array of task IDs it depends on (empty if independent/leaf task)\n\n"
-            "Be conservative - only mark dependencies when clearly needed. "
-            "Avoid redundant dependencies between similar tasks."
-        ),
+    response = await limited_ai(
+        planning_router,
+        system=_DEPENDENCY_SYSTEM_PROMPT,
         user=(
             f"Research Question: {research_question}\n\n"
             f"Tasks:\n{tasks_text}\n\n"
@@ -399,11 +737,16 @@ async def identify_dependencies(
         schema=TaskDependenciesList,
     )
 
+    if DEP_CACHE_ENABLED:
+        store_dependencies(cache_key, response)
+
     return response
 
 
 @planning_router.reasoner()
-async def deduplicate_tasks(tasks: List[dict], research_question: str) -> TaskMergeList:
+async def deduplicate_tasks(
+    tasks: List[Subtask], research_question: str
+) -> TaskMergeList:
     """
     Identify and merge similar/redundant tasks.
 
@@ -411,27 +754,12 @@ async def deduplicate_tasks(tasks: List[dict], research_question: str) -> TaskMe
     and suggests which tasks to merge into others.
     """
     tasks_text = "\n".join(
-        f"- {task['task_id']}: {task['description']}" for task in tasks
+        f"- {task.task_id}: {task.description}" for task in tasks
     )
 
-    response = await planning_router.ai(
-        system=(
-            "You are a task deduplication expert. Identify tasks that are redundant or ask the same question.\n\n"
-            "## YOUR TASK\n"
-            "Find tasks that:\n"
-            "- Ask the same question in different words\n"
-            "- Cover the same information/research area\n"
-            "- Are essentially duplicates\n\n"
-            "For each group of similar tasks:\n"
-            "- Keep the most specific/clear task (keep_task_id)\n"
-            "- Mark others to merge (merge_task_ids)\n\n"
-            "## IMPORTANT\n"
-            "- Only merge tasks that are truly redundant\n"
-            "- Keep tasks that cover different aspects, even if related\n"
-            "- Be conservative - when in doubt, don't merge\n\n"
-            "Return ONLY a JSON object with a 'merges' array. "
-            "Each merge has keep_task_id and merge_task_ids."
-        ),
+    response = await limited_ai(
+        planning_router,
+        system=_DEDUP_SYSTEM_PROMPT,
         user=(
             f"Research Question: {research_question}\n\n"
             f"Tasks:\n{tasks_text}\n\n"
@@ -463,25 +791,9 @@ async def decide_search_strategy(
         for dep in dependency_findings
     )
 
-    response = await planning_router.ai(
-        system=(
-            "You are a task strategy expert deciding how to answer a parent task.\n\n"
-            "## TWO STRATEGIES\n"
-            "1. **synthesize_only**: Can answer from children's findings alone\n"
-            "   - Example: 'Summarize X' when we have 'What is X?' and 'What are X's features?'\n"
-            "   - Example: 'List all features' when we have individual feature tasks\n\n"
-            "2. **enhanced_search**: Needs additional web search with dependency context\n"
-            "   - Example: 'Compare X to Y' when we have 'What is X?' but need Y info\n"
-            "   - Example: 'Analyze market trends' when we have data but need external context\n"
-            "   - Example: 'Find competitors' when we have product info but need market research\n\n"
-            "## DECISION CRITERIA\n"
-            "- If the task asks for information NOT in children → enhanced_search\n"
-            "- If the task can be answered by combining children → synthesize_only\n"
-            "- If the task needs external context/comparison → enhanced_search\n"
-            "- If the task is pure synthesis/summary → synthesize_only\n\n"
-            "Return ONLY a JSON object with 'strategy' ('synthesize_only' or 'enhanced_search') "
-            "and 'reasoning' (brief explanation)."
-        ),
+    response = await limited_ai(
+        planning_router,
+        system=_STRATEGY_SYSTEM_PROMPT,
         user=(
             f"Research Question: {research_question}\n\n"
             f"Parent Task: {task_description}\n\n"
@@ -504,16 +816,11 @@ async def _execute_task_smart(
     Smart task executor that routes to search or synthesis based on dependencies and strategy.
 
     - Leaf tasks (no deps) → search via execute_research_task
-    - Parent tasks (has deps) → decide strategy:
-      - synthesize_only → synthesize_from_dependencies
+    - Parent tasks (has deps) → answer_parent_task picks a strategy:
+      - synthesize_only → its answer is the result (one call), or
+        synthesize_from_dependencies when the children were too long for it
       - enhanced_search → execute_research_task_with_context
     """
-    from routers.research import (
-        execute_research_task,
-        execute_research_task_with_context,
-        synthesize_from_dependencies,
-    )
-
     if not task.dependencies:
         # Leaf task - search for answers
         return await execute_research_task(
@@ -529,15 +836,26 @@ async def _execute_task_smart(
             if dep_id in completed_results
         ]
 
-        # Decide strategy: synthesize_only or enhanced_search
-        strategy = await decide_search_strategy(
+        # Decide strategy and, for synthesize_only, answer in the same call
+        answer = await answer_parent_task(
+            task_id=task.task_id,
             task_description=task.description,
             research_question=research_question,
             dependency_findings=dependency_findings,
         )
 
-        if strategy.strategy == "synthesize_only":
+        if answer.strategy == "synthesize_only" and answer.findings.strip():
             # Pure synthesis from children
+            return task_result_from_dependencies(
+                task.task_id,
+                task.description,
+                answer.findings,
+                answer.confidence,
+                dependency_findings,
+            )
+        elif answer.strategy == "synthesize_only":
+            # Children too long to answer in the strategy call (or the model
+            # left findings empty): synthesize from the full child answers
             return await synthesize_from_dependencies(
                 task_id=task.task_id,
                 task_description=task.description,
@@ -565,7 +883,7 @@ async def execute_deep_research(
 
     Takes a research question and:
     1. Creates recursive research plan with dependencies
-    2. Executes tasks in topological order (leaf tasks search, parent tasks synthesize)
+    2. Executes each task once its dependencies are done (leaf tasks search, parent tasks synthesize)
     3. Synthesizes final comprehensive report
     """
     # Step 1: Create research plan
@@ -578,25 +896,48 @@ async def execute_deep_research(
     # Step 2: Get execution levels (topological order)
     execution_levels = _get_execution_levels(plan.tasks)
     task_map = {task.task_id: task for task in plan.tasks}
-    completed_results: dict[str, TaskResult] = {}
-
-    # Step 3: Execute tasks level by level
-    for level_idx, level_tasks in enumerate(execution_levels):
-        # Execute tasks in parallel within each level
-        execution_coroutines = [
-            _execute_task_smart(
-                task=task_map[task_id],
-                research_question=research_question,
-                completed_results=completed_results,
-            )
-            for task_id in level_tasks
-            if task_id in task_map
+    level_of = {
+        task_id: level_idx
+        for level_idx, level_tasks in enumerate(execution_levels)
+        for task_id in level_tasks
+    }
+
+    # Step 3: Start each task as soon as its own dependencies finish, rather
+    # than waiting for the whole previous level. Only dependencies on earlier
+    # levels are awaited (edges dropped to break a cycle are ignored), which
+    # is the same set of findings each task saw when running level by level.
+    running: dict[str, asyncio.Future] = {}
+
+    async def run_when_ready(task: Subtask) -> TaskResult:
+        dep_ids = [
+            dep_id
+            for dep_id in task.dependencies
+            if dep_id in running and level_of[dep_id] < level_of[task.task_id]
         ]
+        dep_results = await asyncio.gather(*(running[dep_id] for dep_id in dep_ids))
+        return await _execute_task_smart(
+            task=task,
+            research_question=research_question,
+            completed_results=dict(zip(dep_ids, dep_results)),
+        )
 
-        if execution_coroutines:
-            level_results = await asyncio.gather(*execution_coroutines)
-            for result in level_results:
-                completed_results[result.task_id] = result
+    for level_tasks in execution_levels:
+        for task_id in level_tasks:
+            if task_id in task_map:
+                running[task_id] = asyncio.ensure_future(
+                    run_when_ready(task_map[task_id])
+                )
+
+    try:
+        results = await asyncio.gather(*running.values())
+    except BaseException:
+        for future in running.values():
+            future.cancel()
+        raise
+    # Level order, as before, so the synthesis prompt is stable across runs
+    completed_results: dict[str, TaskResult] = {
+        result.task_id: result for result in results
+    }
 
     # Step 4: Synthesize final report
     all_findings = list(completed_results.values())
@@ -610,21 +951,9 @@ async def execute_deep_research(
         for r in all_findings
     )
 
-    synthesis = await planning_router.ai(
-        system=(
-            "You are a research synthesis expert creating a comprehensive final report.\n\n"
-            "## CONTEXT\n"
-            "You are synthesizing findings from multiple research tasks into a final report.\n"
-            "Each task has been answered (either via web search for leaf tasks, or "
-            "synthesis for parent tasks).\n\n"
-            "## YOUR TASK\n"
-            "Create a comprehensive research report that:\n"
-            "1. Provides an executive summary answering the main research question\n"
-            "2. Organizes detailed findings by topic/theme\n"
-            "3. Draws conclusions and key insights\n"
-            "4. Assesses overall confidence based on all task findings\n\n"
-            "Structure the report clearly and comprehensively."
-        ),
+    synthesis = await limited_ai(
+        planning_router,
+        system=_FINAL_SYNTHESIS_SYSTEM_PROMPT,
         user=(
             f"Research Question: {research_question}\n\n"
             f"All Task Findings:\n{findings_text}\n\n"
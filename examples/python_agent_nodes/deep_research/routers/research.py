@@ -2,16 +2,110 @@
 
 from __future__ import annotations
 
+import asyncio
 import os
+import re
+from functools import partial
 from typing import List
 
 from agentfield import AgentRouter
 
-from schemas import Citation, ResearchFindings, SearchQueries, TaskResult
+from llm_utils import limited_ai
+from schemas import (
+    Citation,
+    ParentTaskAnswer,
+    ResearchFindings,
+    SearchQueries,
+    TaskResult,
+)
 
 
 research_router = AgentRouter(prefix="research")
 
+# Static system prompts, shared verbatim across calls for prefix caching
+_QUERY_SYSTEM_PROMPT = (
+    "You are a search query expert generating queries for a research task.\n\n"
+    "## CONTEXT\n"
+    "This task will be answered via web search.\n"
+    "Generate queries optimized for finding specific answers.\n\n"
+)
+
+_QUERY_SYSTEM_SUFFIX = (
+    "## YOUR TASK\n"
+    "Generate 2-4 focused search queries optimized for web search.\n\n"
+    "Each query should be:\n"
+    "- Specific and targeted to answer the task question\n"
+    "- Use relevant keywords and terminology\n"
+    "- Cover different angles/aspects of the task\n"
+    "- Designed to find specific answers, not general information\n\n"
+    "Return ONLY a JSON object with a 'queries' array of search strings."
+)
+
+_SEARCH_SYNTHESIS_SYSTEM_PROMPT = (
+    "You are a research synthesis expert. Synthesize search results into "
+    "structured findings with numbered points.\n\n"
+    "Format findings as:\n"
+    "1. First finding [1] (reference by number)\n"
+    "2. Second finding [2]\n"
+    "etc.\n\n"
+    "Extract citations: for each numbered reference, provide URL, title, and excerpt.\n\n"
+    "Assess confidence: 'high' if comprehensive, 'medium' if partial, 'low' if insufficient."
+)
+
+_PARENT_SYNTHESIS_SYSTEM_PROMPT = (
+    "You are answering a PARENT TASK by synthesizing answers from child tasks.\n\n"
+    "## CONTEXT\n"
+    "This is a parent task - it depends on child tasks that have already been answered.\n"
+    "Your job is to combine the child answers to answer the parent question.\n\n"
+    "## IMPORTANT\n"
+    "- Do NOT search the web - use ONLY the provided child findings\n"
+    "- Synthesize and combine the child answers\n"
+    "- Create a coherent answer to the parent question\n"
+    "- Reference which child tasks contributed to each point\n\n"
+    "## OUTPUT FORMAT\n"
+    "Provide a structured answer with numbered points.\n"
+    "Reference child tasks like: 'Based on Child Task 1, ...'\n"
+    "Assess confidence based on completeness of child answers."
+)
+
+_PARENT_ANSWER_SYSTEM_PROMPT = (
+    "You are answering a PARENT TASK from the answers of its child tasks, "
+    "or deciding that it needs more web search.\n\n"
+    "## STEP 1: CHOOSE A STRATEGY\n"
+    "1. **synthesize_only**: The parent task can be answered from the child answers alone\n"
+    "   - Example: 'Summarize X' when we have 'What is X?' and 'What are X's features?'\n"
+    "   - Example: 'List all features' when we have individual feature tasks\n\n"
+    "2. **enhanced_search**: Needs additional web search with dependency context\n"
+    "   - Example: 'Compare X to Y' when we have 'What is X?' but need Y info\n"
+    "   - Example: 'Analyze market trends' when we have data but need external context\n\n"
+    "- If the task asks for information NOT in children → enhanced_search\n"
+    "- If the task needs external context/comparison → enhanced_search\n"
+    "- If the task is pure synthesis/summary of the children → synthesize_only\n\n"
+    "## STEP 2: ANSWER (synthesize_only only)\n"
+    "- Do NOT search the web - use ONLY the provided child findings\n"
+    "- Combine the child answers into a coherent answer with numbered points\n"
+    "- Reference child tasks like: 'Based on Child Task 1, ...'\n"
+    "- Assess confidence based on completeness of child answers\n\n"
+    "For enhanced_search, leave 'findings' empty - a search will answer the task instead."
+)
+
+_ENHANCED_SYNTHESIS_SYSTEM_PROMPT = (
+    "You are a research synthesis expert. Synthesize findings from web search "
+    "AND dependency context into structured findings.\n\n"
+    "## CONTEXT\n"
+    "You have:\n"
+    "1. Web search results (new information)\n"
+    "2. Dependency context (answers from child tasks)\n\n"
+    "## YOUR TASK\n"
+    "Combine both sources to answer the task question comprehensively.\n"
+    "Format findings as:\n"
+    "1. First finding [1] (reference by number)\n"
+    "2. Second finding [2]\n"
+    "etc.\n\n"
+    "Extract citations: for each numbered reference, provide URL, title, and excerpt.\n\n"
+    "Assess confidence: 'high' if comprehensive, 'medium' if partial, 'low' if insufficient."
+)
+
 
 @research_router.reasoner()
 async def generate_search_queries(
@@ -32,21 +126,12 @@ async def generate_search_queries(
             "- Use context to make queries more specific and targeted\n"
         )
 
-    response = await research_router.ai(
+    response = await limited_ai(
+        research_router,
         system=(
-            "You are a search query expert generating queries for a research task.\n\n"
-            "## CONTEXT\n"
-            "This task will be answered via web search.\n"
-            "Generate queries optimized for finding specific answers.\n\n"
-            f"{context_section}"
-            "## YOUR TASK\n"
-            "Generate 2-4 focused search queries optimized for web search.\n\n"
-            "Each query should be:\n"
-            "- Specific and targeted to answer the task question\n"
-            "- Use relevant keywords and terminology\n"
-            "- Cover different angles/aspects of the task\n"
-            "- Designed to find specific answers, not general information\n\n"
-            "Return ONLY a JSON object with a 'queries' array of search strings."
+            _QUERY_SYSTEM_PROMPT
+            + context_section
+            + _QUERY_SYSTEM_SUFFIX
         ),
         user=(
             f"Research Question: {research_question}\n"
@@ -73,21 +158,30 @@ async def execute_search(queries: List[str]) -> dict:
 
     client = TavilyClient(api_key=api_key)
 
-    # Execute searches in parallel
-    all_results = []
-    for query in queries:
+    async def search_one(query: str) -> dict:
         try:
-            result = client.search(
-                query=query,
-                search_depth="advanced",
-                max_results=5,
-                include_answer=False,
-                include_raw_content=True,
+            # TavilyClient is blocking; run it off the event loop
+            # (run_in_executor rather than asyncio.to_thread, which is 3.9+)
+            return await asyncio.get_running_loop().run_in_executor(
+                None,
+                partial(
+                    client.search,
+                    query=query,
+                    search_depth="advanced",
+                    max_results=5,
+                    include_answer=False,
+                    include_raw_content=True,
+                ),
             )
-            all_results.append(result)
         except Exception as e:
             # Continue with other queries if one fails
-            all_results.append({"error": str(e), "query": query})
+            return {"error": str(e), "query": query}
+
+    # Execute searches in parallel: latency is the slowest query, not the sum.
+    # A repeated query would return the same results, so each is sent once.
+    all_results = await asyncio.gather(
+        *[search_one(query) for query in dict.fromkeys(queries)]
+    )
 
     # Combine results
     combined = {
@@ -95,13 +189,40 @@ async def execute_search(queries: List[str]) -> dict:
         "queries": queries,
     }
 
+    # Queries for one task overlap, so the same page often comes back more
+    # than once; keep its first occurrence so duplicates don't take up the
+    # synthesis prompt's result slots
+    seen_urls = set()
     for result in all_results:
         if "error" not in result and "results" in result:
-            combined["results"].extend(result["results"])
+            for item in result["results"]:
+                url = item.get("url")
+                if url:
+                    if url in seen_urls:
+                        continue
+                    seen_urls.add(url)
+                combined["results"].append(item)
 
     return combined
 
 
+_CITATION_REF = re.compile(r"\[(\d+)\]")
+
+
+def _cited_results(findings: str, citations_data: List[dict]) -> List[Citation]:
+    """
+    Citations for the numbered search results referenced as ``[n]`` in
+    ``findings``, in result order. The findings are scanned once for all
+    references instead of once per result, and only cited results are built.
+    """
+    referenced = set(_CITATION_REF.findall(findings))
+    return [
+        Citation(**c)
+        for idx, c in enumerate(citations_data, start=1)
+        if str(idx) in referenced
+    ]
+
+
 @research_router.reasoner()
 async def synthesize_findings(
     task_description: str,
@@ -124,17 +245,9 @@ async def synthesize_findings(
 
         citations_data.append({"url": url, "title": title, "excerpt": excerpt})
 
-    response = await research_router.ai(
-        system=(
-            "You are a research synthesis expert. Synthesize search results into "
-            "structured findings with numbered points.\n\n"
-            "Format findings as:\n"
-            "1. First finding [1] (reference by number)\n"
-            "2. Second finding [2]\n"
-            "etc.\n\n"
-            "Extract citations: for each numbered reference, provide URL, title, and excerpt.\n\n"
-            "Assess confidence: 'high' if comprehensive, 'medium' if partial, 'low' if insufficient."
-        ),
+    response = await limited_ai(
+        research_router,
+        system=_SEARCH_SYNTHESIS_SYSTEM_PROMPT,
         user=(
             f"Research Question: {research_question}\n"
             f"Task: {task_description}\n\n"
@@ -145,16 +258,8 @@ async def synthesize_findings(
         schema=ResearchFindings,
     )
 
-    # Map citations from search results
-    citation_map = {idx + 1: Citation(**c) for idx, c in enumerate(citations_data)}
-
-    # Update citations in response based on references in findings
-    final_citations = []
-    for i in range(1, len(citations_data) + 1):
-        if f"[{i}]" in response.findings and i in citation_map:
-            final_citations.append(citation_map[i])
-
-    response.citations = final_citations
+    # Keep the search results the findings actually reference
+    response.citations = _cited_results(response.findings, citations_data)
     return response
 
 
@@ -204,29 +309,11 @@ async def synthesize_from_dependencies(
     child task answers rather than searching the web.
     """
     # Format dependency findings for the prompt
-    children_text = "\n\n".join(
-        f"Child Task {idx + 1} ({dep.task_id}): {dep.description}\n"
-        f"Answer: {dep.findings}\n"
-        f"Sources: {', '.join(dep.sources) if dep.sources else 'N/A'}"
-        for idx, dep in enumerate(dependency_findings)
-    )
+    children_text = _children_text(dependency_findings)
 
-    response = await research_router.ai(
-        system=(
-            "You are answering a PARENT TASK by synthesizing answers from child tasks.\n\n"
-            "## CONTEXT\n"
-            "This is a parent task - it depends on child tasks that have already been answered.\n"
-            "Your job is to combine the child answers to answer the parent question.\n\n"
-            "## IMPORTANT\n"
-            "- Do NOT search the web - use ONLY the provided child findings\n"
-            "- Synthesize and combine the child answers\n"
-            "- Create a coherent answer to the parent question\n"
-            "- Reference which child tasks contributed to each point\n\n"
-            "## OUTPUT FORMAT\n"
-            "Provide a structured answer with numbered points.\n"
-            "Reference child tasks like: 'Based on Child Task 1, ...'\n"
-            "Assess confidence based on completeness of child answers."
-        ),
+    response = await limited_ai(
+        research_router,
+        system=_PARENT_SYNTHESIS_SYSTEM_PROMPT,
         user=(
             f"Research Question: {research_question}\n\n"
             f"Parent Task: {task_description}\n\n"
@@ -237,6 +324,47 @@ async def synthesize_from_dependencies(
         schema=ResearchFindings,
     )
 
+    return task_result_from_dependencies(
+        task_id,
+        task_description,
+        response.findings,
+        response.confidence,
+        dependency_findings,
+    )
+
+
+# Total child findings (characters) answer_parent_task sends in full; above
+# this it only sends a short summary of each child and decides the strategy
+_PARENT_ANSWER_BUDGET = 6000
+# Characters of each child's findings in that summary
+_CHILD_SUMMARY_CHARS = 200
+
+
+def _children_summary(dependency_findings: List[TaskResult]) -> str:
+    return "\n".join(
+        f"- {dep.task_id}: {dep.description}\n"
+        f"  Answer: {dep.findings[:_CHILD_SUMMARY_CHARS]}..."
+        for dep in dependency_findings
+    )
+
+
+def _children_text(dependency_findings: List[TaskResult]) -> str:
+    return "\n\n".join(
+        f"Child Task {idx + 1} ({dep.task_id}): {dep.description}\n"
+        f"Answer: {dep.findings}\n"
+        f"Sources: {', '.join(dep.sources) if dep.sources else 'N/A'}"
+        for idx, dep in enumerate(dependency_findings)
+    )
+
+
+def task_result_from_dependencies(
+    task_id: str,
+    task_description: str,
+    findings: str,
+    confidence: str,
+    dependency_findings: List[TaskResult],
+) -> TaskResult:
+    """Build a parent TaskResult whose sources are its children's sources."""
     # Collect sources from all dependencies
     all_sources = []
     for dep in dependency_findings:
@@ -249,10 +377,55 @@ async def synthesize_from_dependencies(
     return TaskResult(
         task_id=task_id,
         description=task_description,
-        findings=response.findings,
-        sources=list(set(all_sources)),  # Deduplicate
-        confidence=response.confidence,
+        findings=findings,
+        sources=list(dict.fromkeys(all_sources)),  # Deduplicate, keeping order
+        confidence=confidence,
+    )
+
+
+@research_router.reasoner()
+async def answer_parent_task(
+    task_id: str,
+    task_description: str,
+    research_question: str,
+    dependency_findings: List[TaskResult],
+) -> ParentTaskAnswer:
+    """
+    Decide a parent task's strategy and, for synthesize_only, answer it in the
+    same call - one round trip instead of decide_search_strategy followed by
+    synthesize_from_dependencies.
+
+    The full child answers only go in while they fit _PARENT_ANSWER_BUDGET.
+    Larger parents get the short per-child summary the strategy decision
+    used to see, and come back with empty findings; the caller then
+    synthesizes from the full answers separately, so a parent headed for
+    enhanced_search never pays for the full child text twice.
+    """
+    if sum(len(dep.findings) for dep in dependency_findings) <= _PARENT_ANSWER_BUDGET:
+        children_text = _children_text(dependency_findings)
+        instruction = (
+            "Choose a strategy. If synthesize_only, answer the parent task from the "
+            "child answers; if enhanced_search, leave findings empty."
+        )
+    else:
+        children_text = _children_summary(dependency_findings)
+        instruction = (
+            "The child answers above are truncated. Choose a strategy only and "
+            "leave findings empty - the answer is written separately."
+        )
+
+    response = await limited_ai(
+        research_router,
+        system=_PARENT_ANSWER_SYSTEM_PROMPT,
+        user=(
+            f"Research Question: {research_question}\n\n"
+            f"Parent Task: {task_description}\n\n"
+            f"Child Task Answers:\n{children_text}\n\n"
+            f"{instruction}"
+        ),
+        schema=ParentTaskAnswer,
     )
+    return response
 
 
 @research_router.reasoner()
@@ -301,23 +474,9 @@ async def execute_research_task_with_context(
         citations_data.append({"url": url, "title": title, "excerpt": excerpt})
 
     # Synthesize with both search results and dependency context
-    response = await research_router.ai(
-        system=(
-            "You are a research synthesis expert. Synthesize findings from web search "
-            "AND dependency context into structured findings.\n\n"
-            "## CONTEXT\n"
-            "You have:\n"
-            "1. Web search results (new information)\n"
-            "2. Dependency context (answers from child tasks)\n\n"
-            "## YOUR TASK\n"
-            "Combine both sources to answer the task question comprehensively.\n"
-            "Format findings as:\n"
-            "1. First finding [1] (reference by number)\n"
-            "2. Second finding [2]\n"
-            "etc.\n\n"
-            "Extract citations: for each numbered reference, provide URL, title, and excerpt.\n\n"
-            "Assess confidence: 'high' if comprehensive, 'medium' if partial, 'low' if insufficient."
-        ),
+    response = await limited_ai(
+        research_router,
+        system=_ENHANCED_SYNTHESIS_SYSTEM_PROMPT,
         user=(
             f"Research Question: {research_question}\n"
             f"Task: {task_description}\n\n"
@@ -329,27 +488,19 @@ async def execute_research_task_with_context(
         schema=ResearchFindings,
     )
 
-    # Map citations from search results
-    citation_map = {idx + 1: Citation(**c) for idx, c in enumerate(citations_data)}
-
-    # Update citations in response based on references in findings
-    final_citations = []
-    for i in range(1, len(citations_data) + 1):
-        if f"[{i}]" in response.findings and i in citation_map:
-            final_citations.append(citation_map[i])
-
-    response.citations = final_citations
+    # Keep the search results the findings actually reference
+    response.citations = _cited_results(response.findings, citations_data)
 
     # Collect sources from dependencies and search
     all_sources = []
     for dep in dependency_findings:
         all_sources.extend(dep.sources)
-    all_sources.extend([f"{c.title} ({c.url})" for c in final_citations])
+    all_sources.extend([f"{c.title} ({c.url})" for c in response.citations])
 
     return TaskResult(
         task_id=task_id,
         description=task_description,
         findings=response.findings,
-        sources=list(set(all_sources)),  # Deduplicate
+        sources=list(dict.fromkeys(all_sources)),  # Deduplicate, keeping order
         confidence=response.confidence,
     )
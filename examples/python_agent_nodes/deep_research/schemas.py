@@ -154,3 +154,22 @@ class SearchStrategy(BaseModel):
         default="",
         description="Brief reasoning for the strategy choice",
     )
+
+
+class ParentTaskAnswer(BaseModel):
+    """Strategy decision for a parent task plus its answer when synthesis suffices."""
+
+    strategy: str = Field(
+        description="Strategy: 'synthesize_only' or 'enhanced_search'"
+    )
+    reasoning: str = Field(
+        default="",
+        description="Brief reasoning for the strategy choice",
+    )
+    findings: str = Field(
+        default="",
+        description="For synthesize_only: the answer as numbered points. Empty for enhanced_search",
+    )
+    confidence: str = Field(
+        default="low", description="Confidence level: 'high', 'medium', or 'low'"
+    )
@@ -0,0 +1,102 @@
+"""Stage memory of successful task decompositions keyed by description embedding.
+
+refine_task uses prior high-scoring decompositions of semantically similar
+tasks as few-shot examples, so the model adapts an existing breakdown
+instead of deriving one from scratch.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import List, Tuple
+
+from agentfield.logger import log_warn
+
+from embedding import aembed_query
+
+STAGE_MEMORY_ENABLED = os.getenv("STAGE_MEMORY_ENABLED", "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+STAGE_MEMORY_THRESHOLD = float(os.getenv("STAGE_MEMORY_THRESHOLD", "0.80"))
+
+# Refinements scoring below this are not worth remembering
+_MIN_SCORE = 0.75
+_KIND = "deep_research_refinement"
+
+
+def score_refinement(children: List[str]) -> float:
+    """Cheap quality heuristic: 2-4 children with no duplicate descriptions."""
+    if not children:
+        return 0.0
+    distinct = len({child.strip().lower() for child in children})
+    score = distinct / len(children)
+    if not 2 <= len(children) <= 4:
+        score *= 0.5
+    return score
+
+
+def format_examples(examples: List[Tuple[str, List[str]]]) -> str:
+    """Render retrieved decompositions as few-shot text for a system prompt."""
+    blocks = []
+    for description, children in examples:
+        lines = "\n".join(f"  - {child}" for child in children)
+        blocks.append(f"Task: {description}\nSubtasks:\n{lines}")
+    return "\n\n".join(blocks)
+
+
+class StageMemory:
+    """Retrieve and record decompositions for semantically similar tasks."""
+
+    def __init__(self, router, threshold: float = STAGE_MEMORY_THRESHOLD):
+        self.router = router
+        self.threshold = threshold
+
+    async def retrieve(
+        self, description: str, k: int = 3
+    ) -> List[Tuple[str, List[str]]]:
+        """Return up to ``k`` prior (description, children) pairs above threshold."""
+        try:
+            hits = await self.router.memory.global_scope.similarity_search(
+                query_embedding=await aembed_query(description),
+                top_k=k,
+                filters={"kind": _KIND},
+            )
+        except Exception as e:
+            log_warn(f"Stage memory lookup failed: {e}")
+            return []
+
+        examples = []
+        for hit in hits or []:
+            if float(hit.get("score", 0.0)) < self.threshold:
+                continue
+            metadata = hit.get("metadata", {})
+            try:
+                children = json.loads(metadata.get("children_json", "[]"))
+            except ValueError:
+                continue
+            if children:
+                examples.append((metadata.get("description", ""), children))
+        return examples
+
+    async def store(self, description: str, children: List[str], score: float) -> None:
+        """Remember a decomposition if it scores well enough to reuse."""
+        if score < _MIN_SCORE:
+            return
+        digest = hashlib.sha256(description.encode()).hexdigest()[:16]
+        try:
+            await self.router.memory.global_scope.set_vector(
+                key=f"{_KIND}:{digest}",
+                embedding=await aembed_query(description),
+                metadata={
+                    "kind": _KIND,
+                    "description": description,
+                    "children_json": json.dumps(children),
+                    "score": score,
+                },
+            )
+        except Exception as e:
+            log_warn(f"Stage memory store failed: {e}")
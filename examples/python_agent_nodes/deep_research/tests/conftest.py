@@ -0,0 +1,8 @@
+"""Put the example's flat modules (schemas, llm_utils, routers) on sys.path."""
+
+import sys
+from pathlib import Path
+
+EXAMPLE_DIR = Path(__file__).resolve().parents[1]
+if str(EXAMPLE_DIR) not in sys.path:
+    sys.path.insert(0, str(EXAMPLE_DIR))
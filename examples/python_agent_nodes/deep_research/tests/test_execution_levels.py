@@ -0,0 +1,87 @@
+import pytest
+
+from routers import planning
+from routers.planning import _build_topological_groups, _get_execution_levels
+from schemas import Subtask
+
+
+def _tasks(graph):
+    return [
+        Subtask.model_construct(task_id=task_id, dependencies=deps)
+        for task_id, deps in graph.items()
+    ]
+
+
+@pytest.fixture(params=["graphlib", "kahn"])
+def sorter(request, monkeypatch):
+    """Run every test against graphlib and the Python 3.8 Kahn fallback."""
+    if request.param == "kahn":
+        monkeypatch.setattr(planning, "TopologicalSorter", None)
+    return request.param
+
+
+def test_acyclic_graph_is_grouped_by_level(sorter):
+    levels = _get_execution_levels(
+        _tasks({"report": ["a", "b"], "a": [], "b": ["c"], "c": []})
+    )
+
+    assert levels == [["a", "c"], ["b"], ["report"]]
+
+
+def test_unknown_dependencies_are_ignored(sorter):
+    assert _get_execution_levels(_tasks({"a": ["missing"], "b": ["a"]})) == [
+        ["a"],
+        ["b"],
+    ]
+
+
+def test_two_cycle_drops_the_edge_into_the_smallest_task(sorter):
+    # b stops waiting for a; a keeps its dependency on b
+    assert _get_execution_levels(_tasks({"a": ["b"], "b": ["a"]})) == [["b"], ["a"]]
+
+
+def test_longer_cycle_keeps_the_rest_of_its_edges(sorter):
+    levels = _get_execution_levels(
+        _tasks({"c": ["a"], "a": ["b"], "b": ["c"], "d": ["a"]})
+    )
+
+    # Only c -> a is dropped: c, then b (needs c), then a (needs b), then d
+    assert levels == [["c"], ["b"], ["a"], ["d"]]
+
+
+def test_self_dependency_is_dropped(sorter):
+    assert _get_execution_levels(_tasks({"a": ["a"], "b": ["a"]})) == [["a"], ["b"]]
+
+
+def test_tasks_outside_the_cycle_are_scheduled_first(sorter):
+    levels = _get_execution_levels(
+        _tasks({"free": [], "x": ["y"], "y": ["x"], "after": ["free"]})
+    )
+
+    assert levels[:2] == [["free"], ["after"]]
+    assert levels[2:] == [["y"], ["x"]]
+
+
+def test_several_cycles_are_each_repaired(sorter):
+    levels = _get_execution_levels(
+        _tasks({"a": ["b"], "b": ["a"], "p": ["q"], "q": ["p"], "top": ["a", "p"]})
+    )
+
+    flat = [task_id for level in levels for task_id in level]
+    assert sorted(flat) == ["a", "b", "p", "q", "top"]
+    assert flat.index("b") < flat.index("a") and flat.index("q") < flat.index("p")
+    assert flat[-1] == "top"
+
+
+def test_every_task_is_scheduled_exactly_once(sorter):
+    graph = {f"t{i}": [f"t{(i * 7 + j) % 12}" for j in (1, 3)] for i in range(12)}
+
+    flat = [task_id for level in _get_execution_levels(_tasks(graph)) for task_id in level]
+
+    assert sorted(flat) == sorted(graph)
+
+
+def test_parallelizable_groups_only_keep_multi_task_levels(sorter):
+    tasks = _tasks({"a": [], "b": [], "c": ["a", "b"]})
+
+    assert _build_topological_groups(tasks) == [["a", "b"]]
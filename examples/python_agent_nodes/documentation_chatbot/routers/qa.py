@@ -18,11 +18,22 @@ from pipeline_utils import (
 from product_context import PRODUCT_CONTEXT
 from routers.query_planning import plan_queries
 from routers.retrieval import parallel_retrieve
-from schemas import DocAnswer, RetrievalResult
+from schemas import Citation, DocAnswer, RetrievalResult
 
 qa_router = AgentRouter(tags=["qa"])
 
 
+def _with_citations(answer: DocAnswer, citations: List[Citation]) -> DocAnswer:
+    """Inject citation metadata unless the model already filled it in.
+
+    ``qa_router.ai(schema=DocAnswer)`` returns a ``DocAnswer`` or raises, so
+    there is no dict/other-type fallback to handle here.
+    """
+    if not answer.citations:
+        answer.citations = citations
+    return answer
+
+
 @qa_router.reasoner()
 async def synthesize_answer(
     question: str,
@@ -150,14 +161,7 @@ Then self-assess and set confidence, needs_more, and missing_topics accordingly.
         schema=DocAnswer,
     )
 
-    if isinstance(response, DocAnswer):
-        if not response.citations:
-            response.citations = citations
-        return response
-
-    response_dict = response if isinstance(response, dict) else response.model_dump()
-    response_dict["citations"] = citations
-    return DocAnswer.model_validate(response_dict)
+    return _with_citations(response, citations)
 
 
 @qa_router.reasoner()
@@ -399,16 +403,7 @@ Then self-assess and set confidence, needs_more, and missing_topics accordingly.
         schema=DocAnswer,
     )
 
-    if isinstance(response, DocAnswer):
-        if not response.citations:
-            response.citations = citations
-        answer = response
-    else:
-        response_dict = (
-            response if isinstance(response, dict) else response.model_dump()
-        )
-        response_dict["citations"] = citations
-        answer = DocAnswer.model_validate(response_dict)
+    answer = _with_citations(response, citations)
 
     log_info(
         f"[qa_answer_with_documents] First synthesis: confidence={answer.confidence}, "
@@ -473,16 +468,7 @@ Then self-assess and set confidence, needs_more, and missing_topics accordingly.
             schema=DocAnswer,
         )
 
-        if isinstance(response, DocAnswer):
-            if not response.citations:
-                response.citations = citations
-            answer = response
-        else:
-            response_dict = (
-                response if isinstance(response, dict) else response.model_dump()
-            )
-            response_dict["citations"] = citations
-            answer = DocAnswer.model_validate(response_dict)
+        answer = _with_citations(response, citations)
 
         log_info(
             f"[qa_answer_with_documents] Refined synthesis: confidence={answer.confidence}, "
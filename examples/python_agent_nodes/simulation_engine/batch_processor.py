@@ -0,0 +1,200 @@
+"""OpenAI Batch API path for large, non-latency-critical LLM fan-outs.
+
+Calls submitted within a short window are written to one JSONL upload and
+run as a single batch job, which is billed at roughly half the synchronous
+price in exchange for an asynchronous (up to 24h) completion window.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple, Type
+
+from pydantic import BaseModel
+
+import json_utils
+
+try:  # Optional dependency, only needed when batch_mode is used
+    from openai import AsyncOpenAI
+except ImportError:  # pragma: no cover - optional dependency
+    AsyncOpenAI = None
+
+BATCH_MODEL = os.getenv("BATCH_MODEL", "gpt-4o-mini")
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+
+# How long submit() waits for more calls before uploading a batch
+_COLLECT_WINDOW = 1.0
+# OpenAI limits a single batch input file to 50,000 requests
+_MAX_REQUESTS_PER_BATCH = 50_000
+_TERMINAL_STATES = ("completed", "failed", "expired", "cancelled")
+
+
+def _schema_instruction(schema: Type[BaseModel]) -> str:
+    # Same contract the SDK's agent.ai(schema=...) puts in the system prompt
+    schema_json = json.dumps(schema.model_json_schema(), indent=2)
+    return (
+        "IMPORTANT: You must exactly adhere to the output schema provided below. "
+        "Do not add or omit any fields. Output must be valid JSON matching the schema. "
+        "Here is the output schema you must follow:\n"
+        f"{schema_json}\n"
+        "Repeat: Output ONLY valid JSON matching the schema above. Do not include any extra text or explanation."
+    )
+
+
+class BatchProcessor:
+    """Collect structured LLM calls and resolve them from one Batch API job."""
+
+    def __init__(
+        self,
+        model: str = BATCH_MODEL,
+        poll_interval: float = BATCH_POLL_INTERVAL,
+    ):
+        self.model = model
+        self.poll_interval = poll_interval
+        self._client = None
+        self._pending: List[Tuple[str, Dict[str, Any], Type[BaseModel], asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.Task] = None
+        # The event loop only holds tasks weakly; keep running batch jobs
+        # alive until they resolve their callers' futures
+        self._batch_tasks: Set[asyncio.Task] = set()
+
+    def _get_client(self):
+        if self._client is None:
+            if AsyncOpenAI is None:
+                raise RuntimeError(
+                    "batch_mode requires the 'openai' package (pip install openai)"
+                )
+            self._client = AsyncOpenAI()
+        return self._client
+
+    async def submit(
+        self,
+        user: str,
+        schema: Type[BaseModel],
+        system: Optional[str] = None,
+    ) -> BaseModel:
+        """Queue one call and wait for its parsed result from the batch job."""
+        return await self._enqueue(user, schema, system)
+
+    async def submit_many(
+        self,
+        users: List[str],
+        schema: Type[BaseModel],
+        system: Optional[str] = None,
+    ) -> List[Any]:
+        """
+        Queue several calls as one job without waiting for the collect window.
+
+        Results come back in input order; items that failed are returned as
+        their exception instead of raising, like gather(return_exceptions=True).
+        """
+        futures = [self._enqueue(user, schema, system) for user in users]
+        self._flush_now()
+        return await asyncio.gather(*futures, return_exceptions=True)
+
+    def _enqueue(
+        self, user: str, schema: Type[BaseModel], system: Optional[str]
+    ) -> asyncio.Future:
+        instruction = _schema_instruction(schema)
+        messages = [
+            {
+                "role": "system",
+                "content": f"{system}\n\n{instruction}" if system else instruction,
+            },
+            {"role": "user", "content": user},
+        ]
+        body = {
+            "model": self.model,
+            "messages": messages,
+            "response_format": {"type": "json_object"},
+        }
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((uuid.uuid4().hex, body, schema, future))
+
+        if len(self._pending) >= _MAX_REQUESTS_PER_BATCH:
+            self._flush_now()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.ensure_future(self._flush_later())
+
+        return future
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(_COLLECT_WINDOW)
+        self._flush_now()
+
+    def _flush_now(self) -> None:
+        if self._flush_handle is not None and not self._flush_handle.done():
+            if self._flush_handle is not asyncio.current_task():
+                self._flush_handle.cancel()
+        self._flush_handle = None
+
+        pending, self._pending = self._pending, []
+        if pending:
+            task = asyncio.ensure_future(self._run_batch(pending))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(
+        self, pending: List[Tuple[str, Dict[str, Any], Type[BaseModel], asyncio.Future]]
+    ) -> None:
+        by_id = {custom_id: (schema, future) for custom_id, _, schema, future in pending}
+        try:
+            client = self._get_client()
+            jsonl = "\n".join(
+                json_utils.dumps(
+                    {
+                        "custom_id": custom_id,
+                        "method": "POST",
+                        "url": "/v1/chat/completions",
+                        "body": body,
+                    }
+                )
+                for custom_id, body, _, _ in pending
+            )
+            input_file = await client.files.create(
+                file=("simulation_batch.jsonl", jsonl.encode()), purpose="batch"
+            )
+            batch = await client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+            )
+            print(f"📦 Submitted batch {batch.id} with {len(pending)} requests")
+
+            while batch.status not in _TERMINAL_STATES:
+                await asyncio.sleep(self.poll_interval)
+                batch = await client.batches.retrieve(batch.id)
+
+            if batch.output_file_id:
+                output = await client.files.content(batch.output_file_id)
+                for line in output.text.splitlines():
+                    if not line.strip():
+                        continue
+                    record = json_utils.loads(line)
+                    schema, future = by_id.pop(record["custom_id"], (None, None))
+                    if future is None or future.done():
+                        continue
+                    try:
+                        content = record["response"]["body"]["choices"][0]["message"]["content"]
+                        future.set_result(schema.model_validate_json(content))
+                    except Exception as e:
+                        future.set_exception(
+                            ValueError(f"Could not parse batch response: {e}")
+                        )
+
+            error = RuntimeError(f"Batch {batch.id} ended as '{batch.status}' without a result")
+        except Exception as e:
+            error = e
+
+        # Anything without an output line (failed, expired, upload error) fails
+        for _, future in by_id.values():
+            if not future.done():
+                future.set_exception(error)
+
+
+# Shared processor so concurrent reasoners land in the same batch job
+batch_processor = BatchProcessor()
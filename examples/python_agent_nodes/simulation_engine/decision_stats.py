@@ -0,0 +1,49 @@
+"""Per-decision counts and mean confidence over a simulated population.
+
+With numpy installed the confidences are reduced in one vectorized pass
+(``np.bincount`` with weights); otherwise a plain Python loop is used.
+Both return decisions in first-seen order.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List, Tuple
+
+from schemas import EntityDecision
+
+try:  # Optional dependency: vectorized reductions for large populations
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+
+def decision_stats(
+    decisions: List[EntityDecision],
+) -> Tuple[Dict[str, int], Dict[str, float]]:
+    """Return ``(count, mean confidence)`` per decision option."""
+    if np is not None and decisions:
+        index: Dict[str, int] = {}
+        codes = np.fromiter(
+            (index.setdefault(d.decision, len(index)) for d in decisions),
+            dtype=np.intp,
+            count=len(decisions),
+        )
+        confidences = np.fromiter(
+            (d.confidence for d in decisions), dtype=np.float64, count=len(decisions)
+        )
+        counts = np.bincount(codes, minlength=len(index))
+        sums = np.bincount(codes, weights=confidences, minlength=len(index))
+        return (
+            {name: int(counts[i]) for name, i in index.items()},
+            {name: float(sums[i] / counts[i]) for name, i in index.items()},
+        )
+
+    decision_counts: Dict[str, int] = {}
+    confidence_sums: Dict[str, float] = {}
+    for d in decisions:
+        decision_counts[d.decision] = decision_counts.get(d.decision, 0) + 1
+        confidence_sums[d.decision] = confidence_sums.get(d.decision, 0.0) + d.confidence
+    return (
+        decision_counts,
+        {k: confidence_sums[k] / v for k, v in decision_counts.items()},
+    )
@@ -0,0 +1,54 @@
+"""One keep-alive HTTP connection pool shared by every LLM call on this node.
+
+agent.ai goes through LiteLLM, which otherwise builds (and periodically
+expires) its own httpx clients. Installing a single long-lived client as
+``litellm.aclient_session`` keeps warm TLS connections to the provider for
+the whole process, and multiplexes them over HTTP/2 when ``h2`` is installed.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+from typing import Optional
+
+import httpx
+
+# Optional: HTTP/2 support for httpx (probed without importing it)
+_HTTP2 = importlib.util.find_spec("h2") is not None
+
+LLM_HTTP_MAX_CONNECTIONS = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "128"))
+LLM_HTTP_MAX_KEEPALIVE = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "64"))
+
+_shared_client: Optional[httpx.AsyncClient] = None
+
+
+def install_shared_http_client() -> httpx.AsyncClient:
+    """Create the shared client (once) and hand it to LiteLLM."""
+    global _shared_client
+    if _shared_client is None:
+        import litellm
+
+        _shared_client = httpx.AsyncClient(
+            http2=_HTTP2,
+            limits=httpx.Limits(
+                max_connections=LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE,
+            ),
+            # Provider SDKs pass their own per-request timeout; this is a backstop
+            timeout=httpx.Timeout(600.0, connect=10.0),
+        )
+        litellm.aclient_session = _shared_client
+    return _shared_client
+
+
+async def close_shared_http_client() -> None:
+    """Close the pool on shutdown; safe to call when it was never installed."""
+    global _shared_client
+    if _shared_client is not None:
+        import litellm
+
+        if litellm.aclient_session is _shared_client:
+            litellm.aclient_session = None
+        await _shared_client.aclose()
+        _shared_client = None
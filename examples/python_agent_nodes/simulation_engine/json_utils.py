@@ -0,0 +1,50 @@
+"""JSON serialization for prompts, cache keys and batch files.
+
+Uses orjson when installed (several times faster than the stdlib encoder on
+the dict payloads built per call) and falls back to ``json`` with matching
+output: compact separators, or two-space indentation, and UTF-8 left
+unescaped.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Optional
+
+try:  # Optional dependency: faster JSON encoding
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def dumps(
+    obj: Any,
+    *,
+    indent: bool = False,
+    sort_keys: bool = False,
+    default: Optional[Callable[[Any], Any]] = None,
+) -> str:
+    """Serialize ``obj`` to a JSON string (``indent`` means two spaces)."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=default, option=option).decode()
+
+    return json.dumps(
+        obj,
+        indent=2 if indent else None,
+        separators=None if indent else (",", ":"),
+        sort_keys=sort_keys,
+        default=default,
+        ensure_ascii=False,
+    )
+
+
+def loads(data: str) -> Any:
+    """Parse a JSON document."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -6,6 +6,7 @@ LLM-powered multi-reasoner architecture with maximum parallelism.
 
 from __future__ import annotations
 
+import asyncio
 import os
 from pathlib import Path
 import sys
@@ -13,6 +14,11 @@ from dotenv import load_dotenv
 
 from agentfield import AIConfig, Agent
 
+try:  # Optional: libuv event loop for the LLM fan-out heavy workloads
+    import uvloop
+except ImportError:
+    uvloop = None
+
 load_dotenv()
 
 if __package__ in (None, ""):
@@ -20,6 +26,8 @@ if __package__ in (None, ""):
     if str(current_dir) not in sys.path:
         sys.path.insert(0, str(current_dir))
 
+from http_pool import close_shared_http_client, install_shared_http_client
+from llm_utils import AI_MODEL_CHEAP, LLM_MAX_INFLIGHT
 from routers import (
     aggregation_router,
     decision_router,
@@ -27,13 +35,16 @@ from routers import (
     scenario_router,
     simulation_router,
 )
+from routers.decision import close_decision_coalescer
 
 app = Agent(
     node_id="simulation-enginepy",
     agentfield_server=f"{os.getenv('AGENTFIELD_SERVER', 'http://localhost:8080')}",
     dev_mode=True,
     ai_config=AIConfig(
-        model="openrouter/deepseek/deepseek-v3.1-terminus",  # LiteLLM auto-detects provider from model name
+        model=os.getenv(
+            "AI_MODEL", "openrouter/deepseek/deepseek-v3.1-terminus"
+        ),  # LiteLLM auto-detects provider from model name
         api_key=os.getenv("OPENROUTER_API_KEY"),  # or set OPENAI_API_KEY env var
     ),
 )
@@ -48,6 +59,11 @@ for router in (
 ):
     app.include_router(router)
 
+# Reuse warm provider connections across every reasoner's AI calls
+install_shared_http_client()
+app.on_event("shutdown")(close_shared_http_client)
+app.on_event("shutdown")(close_decision_coalescer)
+
 
 if __name__ == "__main__":
     print("🎯 Generalized Multi-Agent Simulation System")
@@ -68,6 +84,14 @@ if __name__ == "__main__":
     print("  - Parallel decision simulation (20 concurrent)")
     print("  - Intelligent data sampling for analysis")
     print("  - Domain-agnostic (works for any enterprise scenario)")
+    print(f"\n🤖 Model: {app.ai_config.model}")
+    print(f"🪶 Bulk model (entities, decisions): {AI_MODEL_CHEAP or app.ai_config.model}")
+    print(f"⚙️  Max in-flight LLM calls: {LLM_MAX_INFLIGHT} (LLM_MAX_INFLIGHT)")
+
+    if uvloop is not None:
+        # Also covers CLI-mode runs; serve() already prefers uvloop when present
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    print(f"🔁 Event loop: {'uvloop' if uvloop is not None else 'asyncio'}")
 
     port_env = os.getenv("PORT")
     if port_env is None:
@@ -0,0 +1,66 @@
+"""Bounded-concurrency execution for large fan-outs of reasoner calls.
+
+Unlike gathering fixed-size chunks, the pool starts the next call as soon as
+any running one finishes, so one slow LLM call doesn't hold back the rest of
+its chunk. At most ``limit`` calls are in flight at any time.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+
+def phase_cap(n_tasks: int, cap: int, min_cap: int = 1) -> int:
+    """
+    Pool size for a phase of ``n_tasks`` calls: ``cap``, but no more than
+    there are calls, and at least ``min_cap`` of them (so a phase made of a
+    few large calls can still be made to overlap).
+    """
+    return max(min(cap, n_tasks), min(min_cap, n_tasks), 1)
+
+
+async def run_pool(
+    func: Callable[[Any], Awaitable[Any]],
+    items: Iterable[Any],
+    limit: int,
+    on_done: Optional[Callable[[int], None]] = None,
+) -> List[Any]:
+    """
+    Await ``func(item)`` for every item with at most ``limit`` running.
+
+    ``items`` is consumed lazily, one item per free slot, so callers can pass
+    a generator instead of building every item before the first call starts.
+
+    Results come back in input order; calls that failed are returned as their
+    exception instead of raising, like gather(return_exceptions=True).
+    ``on_done`` is called with the number of finished calls after each one.
+    """
+    limit = max(limit, 1)
+    results: Dict[int, Any] = {}
+    pending: Dict[asyncio.Future, int] = {}
+    queued = enumerate(items)
+    try:
+        while True:
+            for index, item in queued:
+                pending[asyncio.ensure_future(func(item))] = index
+                if len(pending) >= limit:
+                    break
+            if not pending:
+                break
+
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = pending.pop(task)
+                try:
+                    results[index] = task.result()
+                except Exception as e:
+                    results[index] = e
+                if on_done is not None:
+                    on_done(len(results))
+    finally:
+        # Only reached with calls still running if we were cancelled
+        for task in pending:
+            task.cancel()
+
+    return [results[index] for index in range(len(results))]
@@ -1,12 +1,16 @@
 """Aggregation and analysis router for simulation engine."""
 
-import json
+import heapq
 import random
 from collections import defaultdict
-from typing import List
+from typing import Any, Dict, List
 
 from agentfield import AgentRouter
 
+import json_utils
+from batch_processor import batch_processor
+from decision_stats import decision_stats
+from llm_utils import repaired_ai
 from schemas import (
     EntityDecision,
     EntityProfile,
@@ -17,6 +21,58 @@ from schemas import (
 
 aggregation_router = AgentRouter(prefix="aggregation")
 
+# Static analysis instructions, byte-identical across runs for prompt caching
+_INSIGHTS_SYSTEM_PROMPT = """You analyze the results of a multi-entity decision simulation.
+You receive pre-computed summaries of the results, not the raw data.
+
+Analyze these results and provide insights:
+
+1. outcome_distribution: Return the exact dictionary given in the request.
+
+2. key_insight: ONE sentence capturing the most important finding.
+
+3. detailed_analysis: 4-5 paragraphs covering:
+   - Overall pattern and dominant outcome
+   - Distinct segments and their behaviors
+   - Key drivers (which attributes predicted decisions)
+   - Surprising or counterintuitive findings
+   - Implications and recommendations
+
+4. segment_patterns: 2-3 paragraphs analyzing how different entity types decided:
+   - Group entities by meaningful attribute combinations
+   - Describe each segment's typical decision and why
+   - Note certainty levels by segment
+   - Identify interesting edge cases
+
+5. causal_drivers: 2-3 paragraphs on attribute influence:
+   - Which attributes most strongly influenced decisions
+   - Specific examples from the data
+   - Interaction effects between attributes
+   - Rank drivers by importance
+
+Be specific and reference the summarized data provided."""
+
+
+# Longest attribute value (in characters) copied into the example sections
+_EXAMPLE_VALUE_CHARS = 200
+
+
+def _example_attributes(attributes: Dict[str, Any], keep: List[str]) -> Dict[str, Any]:
+    """
+    Attributes shown for one sampled example: only the scenario's key
+    attributes (all of them if none were identified), with long values cut
+    short. Dozens of examples go into the prompt, so this bounds its size
+    regardless of how verbose the generated entities are.
+    """
+    if keep:
+        attributes = {k: attributes[k] for k in keep if k in attributes}
+    return {
+        k: v[:_EXAMPLE_VALUE_CHARS] + "..."
+        if isinstance(v, str) and len(v) > _EXAMPLE_VALUE_CHARS
+        else v
+        for k, v in attributes.items()
+    }
+
 
 @aggregation_router.reasoner()
 async def aggregate_and_analyze(
@@ -26,47 +82,50 @@ async def aggregate_and_analyze(
     entities: List[EntityProfile],
     decisions: List[EntityDecision],
     context: List[str] = [],
+    batch_mode: bool = False,
 ) -> SimulationInsights:
     """
     Only pass intelligent summaries to AI, not all raw data.
     Pre-compute statistics, create attribute distributions, and sample representative examples.
+    With batch_mode the insight call goes through the OpenAI Batch API.
     """
+    # Nothing to analyze (every entity or decision call failed): answer
+    # directly instead of asking the model to interpret an empty result
+    if not decisions:
+        print("⚠️  No decisions to analyze, skipping insight generation")
+        return SimulationInsights(
+            outcome_distribution={},
+            key_insight="No decisions were simulated, so there is nothing to analyze.",
+            detailed_analysis="The simulation produced no decisions.",
+            segment_patterns="No segments: the simulation produced no decisions.",
+            causal_drivers="No drivers: the simulation produced no decisions.",
+        )
+
     # Compute basic statistics (no AI needed)
     total = len(decisions)
-    decision_counts = {}
-    confidence_by_decision = {}
-
-    for d in decisions:
-        decision_counts[d.decision] = decision_counts.get(d.decision, 0) + 1
-        if d.decision not in confidence_by_decision:
-            confidence_by_decision[d.decision] = []
-        confidence_by_decision[d.decision].append(d.confidence)
-
+    decision_counts, avg_confidence = decision_stats(decisions)
     outcome_dist = {k: v / total for k, v in decision_counts.items()}
-    avg_confidence = {k: sum(v) / len(v) for k, v in confidence_by_decision.items()}
 
     # Create intelligent summaries instead of passing all data
 
     # 1. Attribute distribution summaries (for each attribute, show value frequencies)
     attribute_summaries = {}
     for attr_name in factor_graph.attributes.keys():
-        # Get all values for this attribute
-        attr_values = [
-            e.attributes.get(attr_name) for e in entities if attr_name in e.attributes
-        ]
-
-        # Count frequencies
+        # Count value frequencies straight from the entities, without first
+        # collecting this attribute's values into a list
         value_counts = defaultdict(int)
-        for val in attr_values:
-            if val is not None:
-                # Convert to string for counting, handle different types
-                val_str = str(val)
-                value_counts[val_str] += 1
-
-        # Create summary (top 5 most common values)
-        sorted_values = sorted(value_counts.items(), key=lambda x: x[1], reverse=True)
-        top_values = sorted_values[:5]
-        total_with_attr = len(attr_values)
+        total_with_attr = 0
+        for e in entities:
+            if attr_name in e.attributes:
+                total_with_attr += 1
+                val = e.attributes[attr_name]
+                if val is not None:
+                    # Convert to string for counting, handle different types
+                    value_counts[str(val)] += 1
+
+        # Create summary (top 5 most common values; same order and ties as a
+        # full descending sort)
+        top_values = heapq.nlargest(5, value_counts.items(), key=lambda x: x[1])
 
         if total_with_attr > 0:
             summary_parts = [
@@ -79,40 +138,58 @@ async def aggregate_and_analyze(
             }
 
     # 2. Decision patterns by attribute (which attributes correlate with which decisions)
-    decision_by_attribute = defaultdict(lambda: defaultdict(int))
+    # Only factor-graph attributes are reported, so only those are counted;
+    # the table is keyed up front instead of grown per entity attribute
+    decision_by_attribute = {
+        attr_name: defaultdict(int) for attr_name in factor_graph.attributes
+    }
     for entity, decision in zip(entities, decisions):
-        for attr_name, attr_value in entity.attributes.items():
+        for attr_name, patterns in decision_by_attribute.items():
+            attr_value = entity.attributes.get(attr_name)
             if attr_value is not None:
-                attr_str = str(attr_value)
-                decision_by_attribute[attr_name][(attr_str, decision.decision)] += 1
+                patterns[(str(attr_value), decision.decision)] += 1
 
     # Create summary of strongest correlations
     attribute_decision_patterns = {}
-    for attr_name in factor_graph.attributes.keys():
-        if attr_name in decision_by_attribute:
-            patterns = decision_by_attribute[attr_name]
-            # Find the strongest pattern for this attribute
-            if patterns:
-                top_pattern = max(patterns.items(), key=lambda x: x[1])
-                (attr_val, decision_type), count = top_pattern
-                total_for_attr = sum(patterns.values())
-                attribute_decision_patterns[attr_name] = (
-                    f"When {attr_name}={attr_val}: {count}/{total_for_attr} chose '{decision_type}' "
-                    f"({count*100/total_for_attr:.1f}%)"
-                )
+    for attr_name, patterns in decision_by_attribute.items():
+        # Find the strongest pattern for this attribute
+        if patterns:
+            top_pattern = max(patterns.items(), key=lambda x: x[1])
+            (attr_val, decision_type), count = top_pattern
+            total_for_attr = sum(patterns.values())
+            attribute_decision_patterns[attr_name] = (
+                f"When {attr_name}={attr_val}: {count}/{total_for_attr} chose '{decision_type}' "
+                f"({count*100/total_for_attr:.1f}%)"
+            )
 
     # 3. Sample representative examples intelligently
+    example_keys = scenario_analysis.key_attributes[:7]
     sample_size = min(30, len(entities))  # Max 30 examples to AI
     samples_per_decision = max(3, sample_size // len(decision_counts))
 
+    # Bucket decisions and entities by decision type in one pass each,
+    # instead of rescanning both lists for every decision type
+    first_decision: Dict[str, Dict[str, EntityDecision]] = {
+        decision_type: {} for decision_type in decision_counts
+    }
+    for d in decisions:
+        first_decision[d.decision].setdefault(d.entity_id, d)
+    types_by_entity: Dict[str, List[str]] = defaultdict(list)
+    for decision_type, by_id in first_decision.items():
+        for entity_id in by_id:
+            types_by_entity[entity_id].append(decision_type)
+    entities_by_type: Dict[str, Dict[str, EntityProfile]] = {
+        decision_type: {} for decision_type in decision_counts
+    }
+    for e in entities:
+        for decision_type in types_by_entity.get(e.entity_id, ()):
+            entities_by_type[decision_type][e.entity_id] = e
+
     sampled_examples = []
     for decision_type in decision_counts.keys():
         # Get entities that made this decision
-        matching_decisions = [d for d in decisions if d.decision == decision_type]
-        matching_entity_ids = {d.entity_id for d in matching_decisions}
-        matching_entities = {
-            e.entity_id: e for e in entities if e.entity_id in matching_entity_ids
-        }
+        matching_decisions = first_decision[decision_type]
+        matching_entities = entities_by_type[decision_type]
 
         # Sample some of them
         sample_count = min(samples_per_decision, len(matching_entities))
@@ -121,12 +198,12 @@ async def aggregate_and_analyze(
 
             for entity_id in sampled_ids:
                 entity = matching_entities[entity_id]
-                decision = next(
-                    d for d in matching_decisions if d.entity_id == entity_id
-                )
+                decision = matching_decisions[entity_id]
                 sampled_examples.append(
                     {
-                        "attributes": entity.attributes,
+                        "attributes": _example_attributes(
+                            entity.attributes, example_keys
+                        ),
                         "decision": decision.decision,
                         "key_factor": decision.key_factor,
                         "trade_off": decision.trade_off,
@@ -159,7 +236,9 @@ async def aggregate_and_analyze(
                         "segment": f"{', '.join(f'{k}={v}' for k, v in zip(key_attributes, segment_key))}",
                         "count": len(group),
                         "example_decision": decision.decision,
-                        "example_attributes": entity.attributes,
+                        "example_attributes": _example_attributes(
+                            entity.attributes, example_keys
+                        ),
                     }
                 )
 
@@ -167,12 +246,12 @@ async def aggregate_and_analyze(
     context_str = "\n".join([f"- {c}" for c in context]) if context else ""
 
     # Send intelligent summaries, not raw data!
-    attribute_summaries_str = json.dumps(attribute_summaries, indent=2)
+    attribute_summaries_str = json_utils.dumps(attribute_summaries, indent=True)
     attribute_patterns_str = "\n".join(
         [f"  • {k}: {v}" for k, v in list(attribute_decision_patterns.items())[:10]]
     )
-    segment_summaries_str = json.dumps(segment_examples, indent=2)
-    sampled_examples_str = json.dumps(sampled_examples, indent=2)
+    segment_summaries_str = json_utils.dumps(segment_examples, indent=True)
+    sampled_examples_str = json_utils.dumps(sampled_examples, indent=True)
 
     if context:
         context_block = "CONTEXT:\n" + context_str + "\n\n"
@@ -188,10 +267,10 @@ SCENARIO:
 {', '.join(factor_graph.attributes.keys())}
 
 OUTCOME DISTRIBUTION (from {total} entities):
-{json.dumps(outcome_dist, indent=2)}
+{json_utils.dumps(outcome_dist, indent=True)}
 
 AVERAGE CONFIDENCE BY DECISION:
-{json.dumps(avg_confidence, indent=2)}
+{json_utils.dumps(avg_confidence, indent=True)}
 
 ATTRIBUTE DISTRIBUTIONS (summary of value frequencies):
 {attribute_summaries_str}
@@ -205,37 +284,22 @@ SEGMENT SUMMARIES (grouped by key attributes):
 REPRESENTATIVE EXAMPLES ({len(sampled_examples)} of {total} entities):
 {sampled_examples_str}
 
-TASK:
-Analyze these results and provide insights:
-
-1. outcome_distribution: Return this exact dictionary: {outcome_dist}
-
-2. key_insight: ONE sentence capturing the most important finding.
-
-3. detailed_analysis: 4-5 paragraphs covering:
-   - Overall pattern and dominant outcome
-   - Distinct segments and their behaviors
-   - Key drivers (which attributes predicted decisions)
-   - Surprising or counterintuitive findings
-   - Implications and recommendations
-
-4. segment_patterns: 2-3 paragraphs analyzing how different entity types decided:
-   - Group entities by meaningful attribute combinations
-   - Describe each segment's typical decision and why
-   - Note certainty levels by segment
-   - Identify interesting edge cases
-
-5. causal_drivers: 2-3 paragraphs on attribute influence:
-   - Which attributes most strongly influenced decisions
-   - Specific examples from the data
-   - Interaction effects between attributes
-   - Rank drivers by importance
+For outcome_distribution, return the OUTCOME DISTRIBUTION dictionary above exactly."""
 
-Be specific and reference the summarized data provided."""
-
-    result = await aggregation_router.ai(prompt, schema=SimulationInsights)
+    if batch_mode:
+        result = await batch_processor.submit(
+            prompt, schema=SimulationInsights, system=_INSIGHTS_SYSTEM_PROMPT
+        )
+    else:
+        result = await repaired_ai(
+            aggregation_router,
+            prompt,
+            schema=SimulationInsights,
+            system=_INSIGHTS_SYSTEM_PROMPT,
+        )
 
     # Override with our precise computed values
     result.outcome_distribution = outcome_dist
 
     return result
+
@@ -1,92 +1,367 @@
 """Decision simulation router for simulation engine."""
 
 import asyncio
-from typing import List
+import os
+from functools import lru_cache, partial
+from typing import Dict, List, Optional, Set, Tuple
 
 from agentfield import AgentRouter
 
-from schemas import EntityDecision, EntityProfile, ScenarioAnalysis
+from batch_processor import batch_processor
+from llm_utils import AI_MODEL_CHEAP, repaired_ai
+from pool import phase_cap, run_pool
+from schemas import (
+    EntityDecision,
+    EntityDecisionBatch,
+    EntityProfile,
+    ScenarioAnalysis,
+)
 
 decision_router = AgentRouter(prefix="decision")
 
+# Concurrent single-entity decisions are merged into calls of up to this many
+# entities (1 disables coalescing); the flusher waits at most _COALESCE_WINDOW
+DECISION_COALESCE_SIZE = int(os.getenv("DECISION_COALESCE_SIZE", "1"))
+_COALESCE_WINDOW = 0.05
 
-@decision_router.reasoner()
-async def simulate_entity_decision(
-    entity: EntityProfile,
-    scenario: str,
-    scenario_analysis: ScenarioAnalysis,
-    context: List[str] = [],
-) -> EntityDecision:
-    """
-    Simulates decision with error handling and simplified prompts.
-    Only shows key attributes (5-7) instead of all attributes to reduce JSON parsing issues.
-    """
-    try:
-        context_str = "\n".join([f"- {c}" for c in context]) if context else ""
+# Static instructions live in the system prompt so every call in a run sends
+# a byte-identical prefix that provider-side prompt caching can reuse. Field
+# formats come from the EntityDecision schema agent.ai already sends, so they
+# aren't repeated here.
+_DECISION_SYSTEM_PROMPT = """You are simulating the decision-making of a specific entity.
+Based on who you are, decide how you would respond to the scenario,
+choosing one option from the available decisions list.
 
-        # Only show top 5-7 key attributes, not all attributes
-        key_attrs = scenario_analysis.key_attributes[:7]  # Max 7 attributes
-        if not key_attrs:
-            # Fallback: use first 5 attributes if key_attributes not set
-            key_attrs = list(entity.attributes.keys())[:5]
+Be concise and realistic."""
 
-        # Build simplified attributes string (only key attributes)
-        key_attributes_str = "\n".join(
-            [
-                f"  • {k}: {entity.attributes.get(k, 'N/A')}"
-                for k in key_attrs
-                if k in entity.attributes
-            ]
-        )
+_DECISION_BATCH_SYSTEM_PROMPT = """You are simulating the decision-making of several different entities.
+Decide for each entity independently, based only on who that entity is,
+choosing one option from the available decisions list.
+Return one decision per entity, tagged with its entity_id exactly as given.
 
-        context_section = f"ADDITIONAL CONTEXT:\n{context_str}\n\n" if context else ""
+Be concise and realistic."""
 
-        prompt = f"""You are simulating the decision-making of a specific {scenario_analysis.entity_type}.
+# Per-entity prompt layouts; run-wide sections come first so calls in a run
+# share the longest prefix
+_DECISION_USER_TEMPLATE = """{scenario_section}
 
-WHO YOU ARE:
-{entity.profile_summary}
+YOU ARE A SPECIFIC {entity_type}:
+{profile_summary}
 
 KEY ATTRIBUTES (most relevant for this decision):
-{key_attributes_str}
+{key_attributes}"""
+
+_BATCH_ENTITY_TEMPLATE = (
+    "ENTITY {entity_id}:\n{profile_summary}\nKEY ATTRIBUTES:\n{key_attributes}"
+)
 
-SCENARIO YOU'RE FACING:
+_DECISION_BATCH_USER_TEMPLATE = """{scenario_section}
+
+ENTITIES ({count} different {entity_type} entities):
+{entity_blocks}
+
+Return exactly {count} decisions, one per entity."""
+
+
+@lru_cache(maxsize=64)
+def _scenario_section(
+    scenario: str, decision_options: Tuple[str, ...], context: Tuple[str, ...]
+) -> str:
+    """
+    Run-wide part of every decision prompt, built once per simulation.
+    Every entity in a run sees the same scenario, options and context, so
+    the string is reused instead of re-joined for each of the N calls.
+    """
+    context_str = "\n".join([f"- {c}" for c in context]) if context else ""
+    context_section = f"ADDITIONAL CONTEXT:\n{context_str}\n\n" if context else ""
+    return f"""SCENARIO:
 {scenario}
 
 {context_section}AVAILABLE DECISIONS:
-{', '.join(scenario_analysis.decision_options)}
+{', '.join(decision_options)}"""
+
+
+def _key_attributes_str(entity: EntityProfile, scenario_analysis: ScenarioAnalysis) -> str:
+    """Only show top 5-7 key attributes, not all attributes."""
+    key_attrs = scenario_analysis.key_attributes[:7]  # Max 7 attributes
+    if not key_attrs:
+        # Fallback: use first 5 attributes if key_attributes not set
+        key_attrs = list(entity.attributes.keys())[:5]
+
+    # Build simplified attributes string (only key attributes)
+    return "\n".join(
+        [
+            f"  • {k}: {entity.attributes.get(k, 'N/A')}"
+            for k in key_attrs
+            if k in entity.attributes
+        ]
+    )
 
-TASK:
-Based on who you are, decide how you would respond to this scenario.
 
-1. decision: Choose one option from the available decisions list.
+def _decision_prompt(
+    entity: EntityProfile,
+    scenario: str,
+    scenario_analysis: ScenarioAnalysis,
+    context: List[str],
+) -> str:
+    return _DECISION_USER_TEMPLATE.format(
+        scenario_section=_scenario_section(
+            scenario, tuple(scenario_analysis.decision_options), tuple(context)
+        ),
+        entity_type=scenario_analysis.entity_type.upper(),
+        profile_summary=entity.profile_summary,
+        key_attributes=_key_attributes_str(entity, scenario_analysis),
+    )
 
-2. confidence: Rate confidence 0.0-1.0. How certain are you?
 
-3. key_factor: What single attribute influenced this decision most? (max 50 words)
+def _default_decision(
+    entity: EntityProfile, scenario_analysis: ScenarioAnalysis
+) -> EntityDecision:
+    """Default decision returned instead of failing the whole simulation."""
+    return EntityDecision.model_construct(
+        entity_id=entity.entity_id,
+        decision=scenario_analysis.decision_options[0]
+        if scenario_analysis.decision_options
+        else "unknown",
+        confidence=0.0,
+        key_factor="Error during decision generation",
+        trade_off="Unable to evaluate",
+        reasoning="Failed to generate decision",
+    )
 
-4. trade_off: What was the main trade-off you considered? (max 50 words)
 
-5. reasoning: Optional brief explanation (1-2 sentences, max 100 words).
+@decision_router.reasoner()
+async def simulate_entity_decision(
+    entity: EntityProfile,
+    scenario: str,
+    scenario_analysis: ScenarioAnalysis,
+    context: List[str] = [],
+    batch_mode: bool = False,
+) -> EntityDecision:
+    """
+    Simulates decision with error handling and simplified prompts.
+    Only shows key attributes (5-7) instead of all attributes to reduce JSON parsing issues.
+    With DECISION_COALESCE_SIZE > 1, concurrent calls are merged into batched AI calls.
+    """
+    if DECISION_COALESCE_SIZE > 1 and not batch_mode:
+        return await _coalescer.submit(entity, scenario, scenario_analysis, context)
+    return await _decide_single(
+        entity, scenario, scenario_analysis, context, batch_mode
+    )
 
-Be concise and realistic."""
 
-        result = await decision_router.ai(prompt, schema=EntityDecision)
+async def _decide_single(
+    entity: EntityProfile,
+    scenario: str,
+    scenario_analysis: ScenarioAnalysis,
+    context: List[str],
+    batch_mode: bool = False,
+) -> EntityDecision:
+    """One AI call for one entity; never raises."""
+    try:
+        prompt = _decision_prompt(entity, scenario, scenario_analysis, context)
+
+        if batch_mode:
+            result = await batch_processor.submit(
+                prompt, schema=EntityDecision, system=_DECISION_SYSTEM_PROMPT
+            )
+        else:
+            result = await repaired_ai(
+                decision_router,
+                prompt,
+                schema=EntityDecision,
+                system=_DECISION_SYSTEM_PROMPT,
+                model=AI_MODEL_CHEAP,
+            )
         result.entity_id = entity.entity_id
         return result
 
     except Exception as e:
         print(f"⚠️  Failed entity {entity.entity_id}: {str(e)[:100]}")
         # Return a default decision instead of failing
-        return EntityDecision(
+        return _default_decision(entity, scenario_analysis)
+
+
+@decision_router.reasoner()
+async def simulate_decision_batch(
+    entities: List[EntityProfile],
+    scenario: str,
+    scenario_analysis: ScenarioAnalysis,
+    context: List[str] = [],
+    batch_mode: bool = False,
+) -> List[EntityDecision]:
+    """
+    Simulates decisions for several entities in ONE AI call.
+    The shared scenario prompt is sent once instead of once per entity.
+    Entities missing from the response fall back to individual calls.
+    """
+    scenario_section = _scenario_section(
+        scenario, tuple(scenario_analysis.decision_options), tuple(context)
+    )
+
+    entity_blocks = "\n\n".join(
+        _BATCH_ENTITY_TEMPLATE.format(
             entity_id=entity.entity_id,
-            decision=scenario_analysis.decision_options[0]
-            if scenario_analysis.decision_options
-            else "unknown",
-            confidence=0.0,
-            key_factor="Error during decision generation",
-            trade_off="Unable to evaluate",
-            reasoning="Failed to generate decision",
+            profile_summary=entity.profile_summary,
+            key_attributes=_key_attributes_str(entity, scenario_analysis),
         )
+        for entity in entities
+    )
+
+    prompt = _DECISION_BATCH_USER_TEMPLATE.format(
+        scenario_section=scenario_section,
+        count=len(entities),
+        entity_type=scenario_analysis.entity_type,
+        entity_blocks=entity_blocks,
+    )
+
+    decisions_by_id = {}
+    try:
+        if batch_mode:
+            result = await batch_processor.submit(
+                prompt,
+                schema=EntityDecisionBatch,
+                system=_DECISION_BATCH_SYSTEM_PROMPT,
+            )
+        else:
+            result = await repaired_ai(
+                decision_router,
+                prompt,
+                schema=EntityDecisionBatch,
+                system=_DECISION_BATCH_SYSTEM_PROMPT,
+                model=AI_MODEL_CHEAP,
+            )
+        decisions_by_id = {d.entity_id: d for d in result.decisions}
+    except Exception as e:
+        print(f"⚠️  Failed decision batch: {str(e)[:100]}")
+
+    # Keep input order; retry anything the batch call dropped one at a time
+    missing = [e for e in entities if e.entity_id not in decisions_by_id]
+    if missing:
+        retried = await asyncio.gather(
+            *[
+                _decide_single(entity, scenario, scenario_analysis, context, batch_mode)
+                for entity in missing
+            ]
+        )
+        decisions_by_id.update({d.entity_id: d for d in retried})
+
+    return [decisions_by_id[entity.entity_id] for entity in entities]
+
+
+class _DecisionCoalescer:
+    """
+    Merge concurrent single-entity decision calls into batched AI calls.
+
+    Callers enqueue and await a future. A background flusher drains the queue
+    once it holds ``max_size`` items or ``window`` seconds pass, groups items
+    that share a scenario, and resolves each future from one
+    simulate_decision_batch call per group.
+    """
+
+    def __init__(self, max_size: int, window: float):
+        self.max_size = max_size
+        self.window = window
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+        # The event loop only holds tasks weakly; a collected dispatch would
+        # leave its group's futures pending forever
+        self._dispatches: Set[asyncio.Task] = set()
+
+    async def submit(
+        self,
+        entity: EntityProfile,
+        scenario: str,
+        scenario_analysis: ScenarioAnalysis,
+        context: List[str],
+    ) -> EntityDecision:
+        # Created lazily so both bind to the loop that serves requests
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.ensure_future(self._flush_forever())
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((entity, scenario, scenario_analysis, context, future))
+        return await future
+
+    async def _flush_forever(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(items) < self.max_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Only entities facing the same scenario can share a prompt
+            groups: Dict[Tuple[str, str, Tuple[str, ...]], list] = {}
+            for item in items:
+                _, scenario, scenario_analysis, context, _ = item
+                key = (scenario, scenario_analysis.model_dump_json(), tuple(context))
+                groups.setdefault(key, []).append(item)
+            for group in groups.values():
+                task = asyncio.ensure_future(self._dispatch(group))
+                self._dispatches.add(task)
+                task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, group: list) -> None:
+        _, scenario, scenario_analysis, context, _ = group[0]
+        entities = [item[0] for item in group]
+        try:
+            if len(entities) == 1:
+                decision = await _decide_single(
+                    entities[0], scenario, scenario_analysis, context
+                )
+                decisions = [decision]
+            else:
+                decisions = await simulate_decision_batch(
+                    entities, scenario, scenario_analysis, context
+                )
+        except asyncio.CancelledError:
+            # Torn down mid-call: release the callers instead of leaving them
+            for *_, future in group:
+                future.cancel()
+            raise
+        except Exception as e:
+            for *_, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (*_, future), decision in zip(group, decisions):
+            if not future.done():
+                future.set_result(decision)
+
+    async def aclose(self) -> None:
+        """Stop the flusher and any in-flight dispatches, cancelling their callers."""
+        tasks = list(self._dispatches)
+        if self._flusher is not None:
+            tasks.append(self._flusher)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._flusher = None
+
+        # Items the flusher never picked up
+        if self._queue is not None:
+            while not self._queue.empty():
+                *_, future = self._queue.get_nowait()
+                future.cancel()
+            self._queue = None
+
+
+_coalescer = _DecisionCoalescer(DECISION_COALESCE_SIZE, _COALESCE_WINDOW)
+
+
+async def close_decision_coalescer() -> None:
+    """Tear down the shared coalescer on shutdown; safe when it never ran."""
+    await _coalescer.aclose()
 
 
 @decision_router.reasoner()
@@ -96,51 +371,93 @@ async def simulate_batch_decisions(
     scenario_analysis: ScenarioAnalysis,
     context: List[str] = [],
     parallel_batch_size: int = 20,
+    decisions_per_call: int = 1,
+    batch_mode: bool = False,
 ) -> List[EntityDecision]:
     """
     Process with error handling, rate limiting, and global concurrency control.
-    - Uses return_exceptions=True to prevent one failure from killing the batch
-    - Adds delays between batches to avoid rate limits
+    - Collects exceptions per call so one failure doesn't kill the run
+    - Keeps a bounded number of calls in flight instead of pausing between batches
     - Filters out failed entities
+    - decisions_per_call > 1 packs that many entities into each AI call
+    - batch_mode routes the calls through the OpenAI Batch API
     """
-    all_decisions = []
-
-    # Process in batches to control concurrency
-    num_batches = (len(entities) + parallel_batch_size - 1) // parallel_batch_size
-
-    for batch_num, i in enumerate(range(0, len(entities), parallel_batch_size)):
-        batch = entities[i : i + parallel_batch_size]
-
-        # Each entity gets its own AI call, but we do them in parallel
-        # Use return_exceptions=True so one failure doesn't kill the batch
-        tasks = [
-            simulate_entity_decision(entity, scenario, scenario_analysis, context)
-            for entity in batch
-        ]
-
-        # Use return_exceptions=True to handle failures gracefully
-        batch_results = await asyncio.gather(*tasks, return_exceptions=True)
-
-        # Filter out exceptions and None values
-        valid_decisions = []
-        for result in batch_results:
+    if batch_mode and decisions_per_call <= 1:
+        # One Batch API job built straight from the prompts, instead of a
+        # reasoner call per entity that each wait for the collect window
+        results = await batch_processor.submit_many(
+            [
+                _decision_prompt(entity, scenario, scenario_analysis, context)
+                for entity in entities
+            ],
+            schema=EntityDecision,
+            system=_DECISION_SYSTEM_PROMPT,
+        )
+        decisions = []
+        for entity, result in zip(entities, results):
             if isinstance(result, EntityDecision):
-                valid_decisions.append(result)
-            elif isinstance(result, Exception):
-                print(f"⚠️  Exception in batch: {str(result)[:100]}")
-            # None values are already filtered
+                result.entity_id = entity.entity_id
+            else:
+                print(f"⚠️  Failed entity {entity.entity_id}: {str(result)[:100]}")
+                result = _default_decision(entity, scenario_analysis)
+            decisions.append(result)
+        print(f"   ✅ Batch API returned {len(decisions)}/{len(entities)} decisions")
+        return decisions
+
+    if batch_mode:
+        # Batch API jobs aren't rate limited like live calls; submit everything
+        # at once so it lands in a single job
+        parallel_batch_size = max(len(entities), 1)
+
+    # Each entity (or group of decisions_per_call entities) gets its own AI
+    # call; the pool keeps as many calls in flight as one batch of
+    # parallel_batch_size entities needs, starting the next as each finishes
+    shared = dict(
+        scenario=scenario,
+        scenario_analysis=scenario_analysis,
+        context=context,
+        batch_mode=batch_mode,
+    )
+    if decisions_per_call > 1:
+        decide = partial(simulate_decision_batch, **shared)
+        # Slices are cut as the pool pulls them, not all up front
+        num_calls = (len(entities) + decisions_per_call - 1) // decisions_per_call
+        items = (
+            entities[j : j + decisions_per_call]
+            for j in range(0, len(entities), decisions_per_call)
+        )
+        # Packed calls are few and slow; keep a handful in flight even when
+        # parallel_batch_size entities would fit in one or two of them
+        pool_size = phase_cap(
+            num_calls,
+            (parallel_batch_size + decisions_per_call - 1) // decisions_per_call,
+            min_cap=4,
+        )
+    else:
+        decide = partial(simulate_entity_decision, **shared)
+        num_calls = len(entities)
+        items = entities
+        pool_size = phase_cap(num_calls, parallel_batch_size)
 
-        all_decisions.extend(valid_decisions)
+    def report_progress(done: int) -> None:
+        if done % pool_size == 0 or done == num_calls:
+            print(f"   Completed {done}/{num_calls} decision calls...")
 
-        # Progress reporting
-        print(
-            f"   Batch {batch_num + 1}/{num_batches}: Completed {len(all_decisions)}/{len(entities)} decisions..."
-        )
+    results = await run_pool(decide, items, pool_size, on_done=report_progress)
 
-        # Add delay between batches to avoid rate limits
-        # Only delay if not the last batch
-        if i + parallel_batch_size < len(entities):
-            await asyncio.sleep(0.5)  # 0.5 second delay between batches
+    # Filter out exceptions and None values. Successful calls return exactly
+    # an EntityDecision, or a list of them (simulate_decision_batch always
+    # fills every slot), so those are checked first with exact type tests.
+    all_decisions = []
+    for result in results:
+        result_type = type(result)
+        if result_type is EntityDecision:
+            all_decisions.append(result)
+        elif result_type is list:
+            all_decisions.extend(result)
+        elif isinstance(result, Exception):
+            print(f"⚠️  Exception in batch: {str(result)[:100]}")
+        # None values are already filtered
 
     print(
         f"   ✅ Successfully generated {len(all_decisions)}/{len(entities)} decisions"
@@ -1,15 +1,36 @@
 """Entity generation router for simulation engine."""
 
-import json
+import asyncio
+from functools import lru_cache, partial
 from typing import List
 
 from agentfield import AgentRouter
 from pydantic import BaseModel, Field
 
+import json_utils
+from batch_processor import batch_processor
+from llm_utils import AI_MODEL_CHEAP, repaired_ai
 from schemas import EntityProfile, FactorGraph, ScenarioAnalysis
 
 entity_router = AgentRouter(prefix="entity")
 
+# Static instructions kept byte-identical across calls for prompt caching
+_ENTITY_SYSTEM_PROMPT = """You generate synthetic entities for simulation.
+
+For each entity, create:
+- A complete set of attributes (all attributes from the given list, as keys)
+- Values that are realistic and internally consistent (numbers, strings, booleans as needed)
+- Follow the correlations and dependencies described
+- Ensure diversity across the requested entities
+
+Make entities feel realistic and distinct from each other."""
+
+_EXPLORATION_MODE_INSTRUCTION = """EXPLORATION MODE: Generate entities with unusual or edge-case attributes.
+Sample from distribution tails or create surprising but realistic combinations."""
+
+_STANDARD_MODE_INSTRUCTION = """STANDARD MODE: Generate typical, realistic entities following
+normal distributions and common attribute combinations."""
+
 
 class MiniBatchSchema(BaseModel):
     """Schema for generating multiple entities in one call"""
@@ -17,41 +38,48 @@ class MiniBatchSchema(BaseModel):
     entities: List[dict] = Field(description="List of entity attribute dictionaries")
 
 
-@entity_router.reasoner()
-async def generate_entity_batch(
+@lru_cache(maxsize=None)
+def _call_batch_schema(count: int) -> type:
+    """
+    MiniBatchSchema variant whose description names the exact entity count.
+    Built once per count instead of defining a new model class per AI call.
+    """
+
+    class CallBatchSchema(BaseModel):
+        entities: List[dict] = Field(
+            description=f"List of exactly {count} entity attribute dictionaries"
+        )
+
+    return CallBatchSchema
+
+
+async def _generate_mini_batch(
+    call_num: int,
+    *,
     start_id: int,
     batch_size: int,
+    entities_per_call: int,
     scenario_analysis: ScenarioAnalysis,
     factor_graph: FactorGraph,
-    exploration_ratio: float = 0.1,
+    attributes_json: str,
+    exploration_ratio: float,
+    batch_mode: bool,
 ) -> List[EntityProfile]:
-    """
-    Generate multiple entities in ONE AI call to save tokens.
-    Generate 5-10 entities per call, then parallelize those calls.
-    """
-    # Generate multiple entities per AI call (but not too many)
-    entities_per_call = 5  # Sweet spot for quality vs efficiency
-    num_calls = (batch_size + entities_per_call - 1) // entities_per_call
+    """One AI call of generate_entity_batch; run-wide values are passed in."""
+    start = call_num * entities_per_call
+    count = min(entities_per_call, batch_size - start)
 
-    async def generate_mini_batch(call_num: int) -> List[EntityProfile]:
-        start = call_num * entities_per_call
-        count = min(entities_per_call, batch_size - start)
+    # Determine exploration mode for this mini-batch
+    exploration_mode = start < int(batch_size * exploration_ratio)
 
-        # Determine exploration mode for this mini-batch
-        exploration_mode = start < int(batch_size * exploration_ratio)
+    mode_instruction = (
+        _EXPLORATION_MODE_INSTRUCTION if exploration_mode else _STANDARD_MODE_INSTRUCTION
+    )
 
-        mode_instruction = ""
-        if exploration_mode:
-            mode_instruction = """EXPLORATION MODE: Generate entities with unusual or edge-case attributes.
-Sample from distribution tails or create surprising but realistic combinations."""
-        else:
-            mode_instruction = """STANDARD MODE: Generate typical, realistic entities following
-normal distributions and common attribute combinations."""
-
-        prompt = f"""Generate {count} synthetic {scenario_analysis.entity_type} entities for simulation.
+    prompt = f"""Generate {count} synthetic {scenario_analysis.entity_type} entities for simulation.
 
 AVAILABLE ATTRIBUTES:
-{json.dumps(factor_graph.attributes, indent=2)}
+{attributes_json}
 
 ATTRIBUTE RELATIONSHIPS:
 {factor_graph.attribute_graph}
@@ -61,65 +89,96 @@ SAMPLING GUIDANCE:
 
 {mode_instruction}
 
-TASK:
-Generate exactly {count} diverse entities. For each entity, create:
-- A complete set of attributes (all attributes from the list above)
-- Values that are realistic and internally consistent
-- Follow correlations and dependencies described
-- Ensure diversity across the {count} entities
+Generate exactly {count} diverse entities."""
 
-Return a list of {count} dictionaries, where each dictionary contains:
-- All attribute names as keys
-- Appropriate values (numbers, strings, booleans as needed)
+    try:
+        if batch_mode:
+            result = await batch_processor.submit(
+                prompt,
+                schema=_call_batch_schema(count),
+                system=_ENTITY_SYSTEM_PROMPT,
+            )
+        else:
+            result = await repaired_ai(
+                entity_router,
+                prompt,
+                schema=_call_batch_schema(count),
+                system=_ENTITY_SYSTEM_PROMPT,
+                model=AI_MODEL_CHEAP,
+            )
 
-Make entities feel realistic and distinct from each other."""
+        # Convert to EntityProfile objects
+        profiles = []
+        for i, entity_attrs in enumerate(result.entities):
+            entity_id = f"E_{start_id + start + i:06d}"
 
-        # Use MiniBatchSchema to get multiple entities at once
-        class CallBatchSchema(BaseModel):
-            entities: List[dict] = Field(
-                description=f"List of exactly {count} entity attribute dictionaries"
+            # Generate a quick summary for each entity
+            attrs_str = ", ".join(
+                [f"{k}={v}" for k, v in list(entity_attrs.items())[:5]]
+            )
+            summary = f"{scenario_analysis.entity_type.title()} with {attrs_str}..."
+
+            # Fields are already typed (attributes were validated as a
+            # dict by CallBatchSchema), so skip re-validating each one
+            profile = EntityProfile.model_construct(
+                entity_id=entity_id,
+                attributes=entity_attrs,
+                profile_summary=summary,
             )
+            profiles.append(profile)
 
-        try:
-            result = await entity_router.ai(prompt, schema=CallBatchSchema)
-
-            # Convert to EntityProfile objects
-            profiles = []
-            for i, entity_attrs in enumerate(result.entities):
-                entity_id = f"E_{start_id + start + i:06d}"
-
-                # Generate a quick summary for each entity
-                attrs_str = ", ".join(
-                    [f"{k}={v}" for k, v in list(entity_attrs.items())[:5]]
-                )
-                summary = f"{scenario_analysis.entity_type.title()} with {attrs_str}..."
-
-                profile = EntityProfile(
-                    entity_id=entity_id,
-                    attributes=entity_attrs,
-                    profile_summary=summary,
-                )
-                profiles.append(profile)
-
-            return profiles
-        except Exception as e:
-            print(f"⚠️  Failed to generate mini-batch {call_num}: {str(e)[:100]}")
-            # Return empty list on failure - will be filtered out later
-            return []
+        return profiles
+    except Exception as e:
+        print(f"⚠️  Failed to generate mini-batch {call_num}: {str(e)[:100]}")
+        # Return empty list on failure - will be filtered out later
+        return []
 
-    # Parallelize the mini-batch calls
-    import asyncio
 
+@entity_router.reasoner()
+async def generate_entity_batch(
+    start_id: int,
+    batch_size: int,
+    scenario_analysis: ScenarioAnalysis,
+    factor_graph: FactorGraph,
+    exploration_ratio: float = 0.1,
+    batch_mode: bool = False,
+) -> List[EntityProfile]:
+    """
+    Generate multiple entities in ONE AI call to save tokens.
+    Generate 5-10 entities per call, then parallelize those calls.
+    With batch_mode the calls go through the OpenAI Batch API instead.
+    """
+    # Generate multiple entities per AI call (but not too many)
+    entities_per_call = 5  # Sweet spot for quality vs efficiency
+    num_calls = (batch_size + entities_per_call - 1) // entities_per_call
+
+    # Same for every mini-batch; serialize once instead of per call
+    attributes_json = json_utils.dumps(factor_graph.attributes, indent=True)
+
+    generate_mini_batch = partial(
+        _generate_mini_batch,
+        start_id=start_id,
+        batch_size=batch_size,
+        entities_per_call=entities_per_call,
+        scenario_analysis=scenario_analysis,
+        factor_graph=factor_graph,
+        attributes_json=attributes_json,
+        exploration_ratio=exploration_ratio,
+        batch_mode=batch_mode,
+    )
+
+    # Parallelize the mini-batch calls
     tasks = [generate_mini_batch(i) for i in range(num_calls)]
     results = await asyncio.gather(*tasks, return_exceptions=True)
 
     # Flatten results and filter out exceptions
     all_entities = []
     for i, batch_result in enumerate(results):
-        if isinstance(batch_result, Exception):
-            print(f"⚠️  Exception in entity batch {i}: {str(batch_result)[:100]}")
-        elif isinstance(batch_result, list):
+        # Mini-batches catch their own errors, so a list is the common case
+        if type(batch_result) is list:
             all_entities.extend(batch_result)
+        elif isinstance(batch_result, Exception):
+            print(f"⚠️  Exception in entity batch {i}: {str(batch_result)[:100]}")
         else:
             print(f"⚠️  Unexpected result type in batch {i}: {type(batch_result)}")
 
@@ -4,37 +4,13 @@ from typing import List
 
 from agentfield import AgentRouter
 
-from schemas import FactorGraph, ScenarioAnalysis
+from llm_utils import memoized_ai
+from schemas import FactorGraph, ScenarioAnalysis, ScenarioModel
 
 scenario_router = AgentRouter(prefix="scenario")
 
-
-@scenario_router.reasoner()
-async def decompose_scenario(
-    scenario: str, context: List[str] = []
-) -> ScenarioAnalysis:
-    """
-    Analyzes the scenario to understand what we're simulating.
-    Returns entity type, decision type, and deep analysis.
-    """
-    context_str = (
-        "\n".join([f"- {c}" for c in context])
-        if context
-        else "No additional context provided."
-    )
-
-    prompt = f"""You are analyzing a simulation scenario to understand what needs to be modeled.
-
-SCENARIO:
-{scenario}
-
-CONTEXT:
-{context_str}
-
-TASK:
-Analyze this scenario deeply and provide:
-
-1. entity_type: What type of entity/person are we simulating? (e.g., "customer", "voter", "employee", "consumer")
+# Field instructions shared by the two single-phase prompts and the fused one
+_ANALYSIS_FIELDS = """1. entity_type: What type of entity/person are we simulating? (e.g., "customer", "voter", "employee", "consumer")
 
 2. decision_type: What kind of decision are they making?
    - "binary_choice" (yes/no, stay/leave)
@@ -57,36 +33,104 @@ Be thorough in your analysis - this will guide the entire simulation.
    These should be the most predictive factors. Examples: income, price_sensitivity, tenure, loyalty, alternatives.
    Return as a list of attribute names (e.g., ["price_sensitivity", "income", "tenure", "loyalty", "alternatives"])."""
 
-    result = await scenario_router.ai(prompt, schema=ScenarioAnalysis)
+_FACTOR_GRAPH_FIELDS = """1. attributes: Create a dictionary of all relevant attributes. For each attribute, provide a clear description.
+   Include attributes across these categories:
+   - Demographic (age, location, income, etc.)
+   - Behavioral (usage patterns, preferences, history)
+   - Psychographic (values, attitudes, personality traits)
+   - Contextual (external factors, constraints, alternatives available)
+
+   Keep attribute names simple and lowercase (e.g., "age", "income_level", "price_sensitivity")
+   Make descriptions clear and specific.
+
+2. attribute_graph: Write a detailed explanation (2-3 paragraphs) of:
+   - How attributes influence each other (correlations and dependencies)
+   - How attributes influence the final decision
+   - What are strong vs weak predictors
+   - Any interaction effects (e.g., "age matters more for low-income entities")
+   - Which attributes cluster together to form natural segments
+
+3. sampling_strategy: Describe how to sample these attributes to create realistic entities:
+   - What are typical ranges/distributions for each attribute?
+   - Which attributes are correlated and should be sampled together?
+   - Are there natural segments/archetypes we should ensure are represented?
+   - What makes a "realistic" vs "unrealistic" combination of attributes?"""
+
+
+def _context_str(context: List[str]) -> str:
+    return (
+        "\n".join([f"- {c}" for c in context])
+        if context
+        else "No additional context provided."
+    )
+
+
+def _default_key_attributes(scenario: str) -> List[str]:
+    """Key attributes for common scenario patterns, used when the model gives none."""
+    if "price" in scenario.lower() or "cost" in scenario.lower():
+        return [
+            "price_sensitivity",
+            "income",
+            "budget_constraint",
+            "perceived_value",
+            "alternatives",
+        ]
+    if "upgrade" in scenario.lower() or "switch" in scenario.lower():
+        return [
+            "loyalty",
+            "tenure",
+            "satisfaction",
+            "alternatives",
+            "switching_cost",
+        ]
+    # Generic defaults
+    return [
+        "loyalty",
+        "satisfaction",
+        "alternatives",
+        "tenure",
+        "value",
+    ]
+
+
+# decompose_scenario and generate_factor_graph stay full, independent calls
+# rather than projections of analyze_scenario: run_simulation falls back to
+# them when the larger fused response fails, and generate_factor_graph must
+# condition on the analysis its caller passes in. The three prompts share
+# _ANALYSIS_FIELDS and _FACTOR_GRAPH_FIELDS, so field instructions are only
+# written once.
+
+
+@scenario_router.reasoner()
+async def decompose_scenario(
+    scenario: str, context: List[str] = []
+) -> ScenarioAnalysis:
+    """
+    Analyzes the scenario to understand what we're simulating.
+    Returns entity type, decision type, and deep analysis.
+    """
+    context_str = _context_str(context)
+
+    prompt = f"""You are analyzing a simulation scenario to understand what needs to be modeled.
+
+SCENARIO:
+{scenario}
+
+CONTEXT:
+{context_str}
+
+TASK:
+Analyze this scenario deeply and provide:
+
+{_ANALYSIS_FIELDS}"""
+
+    result = await memoized_ai(scenario_router, prompt, schema=ScenarioAnalysis)
 
     # If key_attributes not provided, use a default set based on common patterns
     if not result.key_attributes:
-        # Default key attributes for common scenarios
-        if "price" in scenario.lower() or "cost" in scenario.lower():
-            result.key_attributes = [
-                "price_sensitivity",
-                "income",
-                "budget_constraint",
-                "perceived_value",
-                "alternatives",
-            ]
-        elif "upgrade" in scenario.lower() or "switch" in scenario.lower():
-            result.key_attributes = [
-                "loyalty",
-                "tenure",
-                "satisfaction",
-                "alternatives",
-                "switching_cost",
-            ]
-        else:
-            # Generic defaults
-            result.key_attributes = [
-                "loyalty",
-                "satisfaction",
-                "alternatives",
-                "tenure",
-                "value",
-            ]
+        result = result.model_copy(
+            update={"key_attributes": _default_key_attributes(scenario)}
+        )
 
     return result
 
@@ -98,11 +142,7 @@ async def generate_factor_graph(
     """
     Creates the factor graph: what attributes matter and how they relate.
     """
-    context_str = (
-        "\n".join([f"- {c}" for c in context])
-        if context
-        else "No additional context provided."
-    )
+    context_str = _context_str(context)
 
     prompt = f"""You are designing the factor graph for a simulation.
 
@@ -123,31 +163,49 @@ Key Insights from Analysis:
 TASK:
 Design the factor graph that defines what attributes each {scenario_analysis.entity_type} should have.
 
-1. attributes: Create a dictionary of all relevant attributes. For each attribute, provide a clear description.
-   Include attributes across these categories:
-   - Demographic (age, location, income, etc.)
-   - Behavioral (usage patterns, preferences, history)
-   - Psychographic (values, attitudes, personality traits)
-   - Contextual (external factors, constraints, alternatives available)
+{_FACTOR_GRAPH_FIELDS}
 
-   Keep attribute names simple and lowercase (e.g., "age", "income_level", "price_sensitivity")
-   Make descriptions clear and specific.
+Be specific and detailed - this defines the entire simulation space."""
 
-2. attribute_graph: Write a detailed explanation (2-3 paragraphs) of:
-   - How attributes influence each other (correlations and dependencies)
-   - How attributes influence the final decision
-   - What are strong vs weak predictors
-   - Any interaction effects (e.g., "age matters more for low-income entities")
-   - Which attributes cluster together to form natural segments
+    result = await memoized_ai(scenario_router, prompt, schema=FactorGraph)
 
-3. sampling_strategy: Describe how to sample these attributes to create realistic entities:
-   - What are typical ranges/distributions for each attribute?
-   - Which attributes are correlated and should be sampled together?
-   - Are there natural segments/archetypes we should ensure are represented?
-   - What makes a "realistic" vs "unrealistic" combination of attributes?
+    return result
+
+
+@scenario_router.reasoner()
+async def analyze_scenario(scenario: str, context: List[str] = []) -> ScenarioModel:
+    """
+    decompose_scenario and generate_factor_graph in ONE call.
+    The scenario and context are sent once, and the factor graph is written
+    right after (and conditioned on) the analysis in the same response.
+    """
+    prompt = f"""You are analyzing a simulation scenario and designing its factor graph.
+
+SCENARIO:
+{scenario}
+
+CONTEXT:
+{_context_str(context)}
+
+TASK:
+Return two objects, in order.
+
+scenario_analysis - analyze this scenario deeply and provide:
+
+{_ANALYSIS_FIELDS}
+
+factor_graph - using that analysis, design the factor graph that defines what attributes each entity should have:
+
+{_FACTOR_GRAPH_FIELDS}
 
 Be specific and detailed - this defines the entire simulation space."""
 
-    result = await scenario_router.ai(prompt, schema=FactorGraph)
+    result = await memoized_ai(scenario_router, prompt, schema=ScenarioModel)
+
+    if not result.scenario_analysis.key_attributes:
+        scenario_analysis = result.scenario_analysis.model_copy(
+            update={"key_attributes": _default_key_attributes(scenario)}
+        )
+        result = result.model_copy(update={"scenario_analysis": scenario_analysis})
 
     return result
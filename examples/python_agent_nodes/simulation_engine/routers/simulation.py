@@ -2,21 +2,76 @@
 
 from __future__ import annotations
 
-from typing import List
+import asyncio
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Tuple
 
 from agentfield import AgentRouter
 
-from schemas import SimulationResult
+from llm_utils import llm_call_stats
+from schemas import EntityDecision, EntityProfile, SimulationResult
 
 # Import reasoners from other routers
 from .aggregation import aggregate_and_analyze
 from .decision import simulate_batch_decisions
 from .entity import generate_entity_batch
-from .scenario import decompose_scenario, generate_factor_graph
+from .scenario import analyze_scenario, decompose_scenario, generate_factor_graph
 
 simulation_router = AgentRouter(prefix="simulation")
 
 
+# Entity batches generated but not yet picked up for decisions; producers
+# wait once this many are queued
+_PIPELINE_DEPTH = 2
+
+
+async def _pipeline_decisions(
+    batch_calls: List[Awaitable[List[EntityProfile]]],
+    decide: Callable[[List[EntityProfile]], Awaitable[List[EntityDecision]]],
+) -> Tuple[List[EntityProfile], List[EntityDecision]]:
+    """
+    Run entity generation and decisions as a producer/consumer pipeline.
+
+    Each entity batch is put on a bounded queue as soon as it is generated;
+    one consumer simulates its decisions (with the usual parallel_batch_size
+    pool) while later batches are still being generated. Results are
+    returned in batch order, as if the phases had run one after the other.
+    """
+    queue: asyncio.Queue = asyncio.Queue(maxsize=_PIPELINE_DEPTH)
+
+    async def produce(
+        batch_num: int, batch_call: Awaitable[List[EntityProfile]]
+    ) -> None:
+        try:
+            entities = await batch_call
+        except Exception as e:
+            # Hand the failure to the consumer so it doesn't wait forever
+            entities = e
+        await queue.put((batch_num, entities))
+
+    producers = asyncio.ensure_future(
+        asyncio.gather(*(produce(i, call) for i, call in enumerate(batch_calls)))
+    )
+    entities_by_batch: Dict[int, List[EntityProfile]] = {}
+    decisions_by_batch: Dict[int, List[EntityDecision]] = {}
+    try:
+        for _ in batch_calls:
+            batch_num, entities = await queue.get()
+            if isinstance(entities, Exception):
+                raise entities
+            entities_by_batch[batch_num] = entities
+            decisions_by_batch[batch_num] = await decide(entities) if entities else []
+        await producers
+    finally:
+        producers.cancel()
+
+    order = sorted(entities_by_batch)
+    return (
+        [entity for i in order for entity in entities_by_batch[i]],
+        [decision for i in order for decision in decisions_by_batch[i]],
+    )
+
+
 @simulation_router.reasoner()
 async def run_simulation(
     scenario: str,
@@ -24,29 +79,40 @@ async def run_simulation(
     context: List[str] = [],
     parallel_batch_size: int = 20,
     exploration_ratio: float = 0.1,
+    decisions_per_call: int = 1,
+    batch_mode: bool = False,
 ) -> SimulationResult:
     """
     Scalable orchestrator with proper batching at each phase.
 
     Handles large N by:
-    1. Generating entities in optimized batches (5 per AI call)
+    1. Generating entities in optimized batches (5 per AI call, batches concurrent)
     2. Simulating decisions in parallel batches (20 concurrent)
+       - each entity batch's decisions start as soon as it is generated
     3. Sampling data for analysis (max 30 examples to AI)
 
+    Set decisions_per_call > 1 to pack several entities into each decision call.
+    Set batch_mode to run entity, decision and insight calls through the OpenAI
+    Batch API (about half the cost, results can take up to 24h).
+
     For small scale testing, use population_size: 20-50 and parallel_batch_size: 10
     """
     print(f"🚀 Starting simulation: {population_size} entities")
 
-    # Phase 1: Understand scenario (single call, always fast)
-    print("\n📋 Phase 1: Analyzing scenario...")
-    scenario_analysis = await decompose_scenario(scenario, context)
+    # Phases 1-2: Understand scenario and build factor graph in one call,
+    # falling back to one call per phase if the combined response fails
+    print("\n📋 Phase 1-2: Analyzing scenario and building factor graph...")
+    try:
+        scenario_model = await analyze_scenario(scenario, context)
+        scenario_analysis = scenario_model.scenario_analysis
+        factor_graph = scenario_model.factor_graph
+    except Exception as e:
+        print(f"   ⚠️  Combined analysis failed ({str(e)[:100]}), running phases separately")
+        scenario_analysis = await decompose_scenario(scenario, context)
+        factor_graph = await generate_factor_graph(scenario, scenario_analysis, context)
     print(f"   Entity type: {scenario_analysis.entity_type}")
     print(f"   Decision type: {scenario_analysis.decision_type}")
     print(f"   Options: {scenario_analysis.decision_options}")
-
-    # Phase 2: Build factor graph (single call, always fast)
-    print("\n🕸️  Phase 2: Building factor graph...")
-    factor_graph = await generate_factor_graph(scenario, scenario_analysis, context)
     print(f"   Tracking {len(factor_graph.attributes)} attributes")
 
     # Phase 3: Generate entities in optimized batches
@@ -54,9 +120,14 @@ async def run_simulation(
 
     # Generate in smart batches (5 entities per AI call, parallelize calls)
     entities_per_batch = 20  # Process 20 entities at a time (4 parallel AI calls of 5 each) - reduced for small scale
-    all_entities = []
+    if batch_mode:
+        # One Batch API job for the whole population instead of one per chunk
+        entities_per_batch = max(population_size, 1)
 
+    # Batches are independent, so run them together; the shared LLM in-flight
+    # limit (LLM_MAX_INFLIGHT) bounds how many AI calls actually overlap
     num_batches = (population_size + entities_per_batch - 1) // entities_per_batch
+    batch_calls = []
     for batch_num in range(num_batches):
         start_id = batch_num * entities_per_batch
         batch_size = min(entities_per_batch, population_size - start_id)
@@ -64,38 +135,73 @@ async def run_simulation(
         print(
             f"   Batch {batch_num + 1}/{num_batches}: Generating {batch_size} entities..."
         )
-        entities = await generate_entity_batch(
-            start_id, batch_size, scenario_analysis, factor_graph, exploration_ratio
+        batch_calls.append(
+            generate_entity_batch(
+                start_id,
+                batch_size,
+                scenario_analysis,
+                factor_graph,
+                exploration_ratio,
+                batch_mode,
+            )
         )
-        all_entities.extend(entities)
-
-    print(f"   ✅ Generated {len(all_entities)} entities")
 
-    # Phase 4: Simulate decisions in controlled parallel batches
-    print("\n🎯 Phase 4: Simulating decisions...")
-    all_decisions = await simulate_batch_decisions(
-        all_entities,
-        scenario,
-        scenario_analysis,
-        context,
+    decide = partial(
+        simulate_batch_decisions,
+        scenario=scenario,
+        scenario_analysis=scenario_analysis,
+        context=context,
         parallel_batch_size=parallel_batch_size,
+        decisions_per_call=decisions_per_call,
+        batch_mode=batch_mode,
     )
 
+    if batch_mode or num_batches <= 1:
+        all_entities = [
+            entity
+            for entities in await asyncio.gather(*batch_calls)
+            for entity in entities
+        ]
+        print(f"   ✅ Generated {len(all_entities)} entities")
+
+        # Phase 4: Simulate decisions in controlled parallel batches
+        print("\n🎯 Phase 4: Simulating decisions...")
+        all_decisions = await decide(all_entities)
+    else:
+        # Phase 4 overlaps phase 3: each entity batch's decisions start as
+        # soon as that batch is generated
+        print("\n🎯 Phase 4: Simulating decisions as entity batches complete...")
+        all_entities, all_decisions = await _pipeline_decisions(batch_calls, decide)
+        print(f"   ✅ Generated {len(all_entities)} entities")
+
     print(f"   ✅ Simulated {len(all_decisions)} decisions")
 
     # Phase 5: Aggregate with sampled data
     print("\n📊 Phase 5: Aggregating results and generating insights...")
     insights = await aggregate_and_analyze(
-        scenario, scenario_analysis, factor_graph, all_entities, all_decisions, context
+        scenario,
+        scenario_analysis,
+        factor_graph,
+        all_entities,
+        all_decisions,
+        context,
+        batch_mode,
     )
 
     print("\n✨ Simulation complete!")
+    if llm_call_stats["timeouts"]:
+        print(
+            f"⏱️  LLM timeouts so far: {llm_call_stats['timeouts']} "
+            f"({llm_call_stats['retries']} retried) - see LLM_TIMEOUT"
+        )
     print(f"\n🎯 KEY INSIGHT: {insights.key_insight}")
     print("\n📈 OUTCOME DISTRIBUTION:")
     for decision, pct in insights.outcome_distribution.items():
         print(f"   {decision}: {pct*100:.1f}%")
 
-    return SimulationResult(
+    # Every field was already validated by the phase that produced it; don't
+    # walk all entities and decisions again
+    return SimulationResult.model_construct(
         scenario=scenario,
         context=context,
         population_size=population_size,
@@ -0,0 +1,88 @@
+"""Admission order for LLM calls waiting on the shared in-flight limit.
+
+When more calls are queued than LLM_MAX_INFLIGHT allows, the strategy picks
+which waiter gets the next free slot, using prompt length as a proxy for
+prefill cost:
+
+- ``balanced``: first come, first served (same as a plain semaphore)
+- ``decode_maximal``: shortest prompt first, so small latency-sensitive
+  calls (single decisions) aren't stuck behind long ones
+- ``prefill_priority``: longest prompt first, clearing the big prefill-heavy
+  calls (entity batches, insights) before the short ones
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Tuple
+
+SCHEDULE_STRATEGIES = ("balanced", "decode_maximal", "prefill_priority")
+LLM_SCHEDULE_STRATEGY = os.getenv("LLM_SCHEDULE_STRATEGY", "balanced")
+
+
+def _check_strategy(strategy: str) -> None:
+    if strategy not in SCHEDULE_STRATEGIES:
+        raise ValueError(
+            f"Unknown LLM_SCHEDULE_STRATEGY {strategy!r}; "
+            f"expected one of {', '.join(SCHEDULE_STRATEGIES)}"
+        )
+
+
+# Fail at startup rather than on the first LLM call
+_check_strategy(LLM_SCHEDULE_STRATEGY)
+
+
+class LLMScheduler:
+    """A counting semaphore whose waiters are admitted by strategy, not FIFO."""
+
+    def __init__(self, limit: int, strategy: str = LLM_SCHEDULE_STRATEGY):
+        _check_strategy(strategy)
+        self.strategy = strategy
+        self._free = limit
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+
+    def _priority(self, size: int) -> int:
+        if self.strategy == "decode_maximal":
+            return size
+        if self.strategy == "prefill_priority":
+            return -size
+        return 0
+
+    async def acquire(self, size: int = 0) -> None:
+        if self._free > 0 and not self._waiters:
+            self._free -= 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        # The sequence number keeps equal priorities in arrival order
+        heapq.heappush(self._waiters, (self._priority(size), next(self._seq), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Granted a slot just as we were cancelled: hand it on
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            # Cancelled waiters are left in the heap and skipped here
+            if not future.done():
+                future.set_result(None)
+                return
+        self._free += 1
+
+    @asynccontextmanager
+    async def slot(self, size: int = 0) -> AsyncIterator[None]:
+        """Hold one slot; ``size`` is the call's estimated prompt length."""
+        await self.acquire(size)
+        try:
+            yield
+        finally:
+            self.release()
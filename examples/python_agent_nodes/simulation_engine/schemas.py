@@ -2,12 +2,20 @@
 
 from typing import Any, Dict, List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+
+# Run-wide inputs are shared by reference across every concurrent call in a
+# simulation and feed its prompt and cache keys, so they are immutable once
+# built; derive a changed copy with model_copy(update=...) instead
+_RUN_INPUT_CONFIG = ConfigDict(frozen=True)
 
 
 class ScenarioAnalysis(BaseModel):
     """Simple schema for scenario decomposition"""
 
+    model_config = _RUN_INPUT_CONFIG
+
     entity_type: str = Field(
         description="Type of entity being simulated (e.g., 'customer', 'voter', 'employee')"
     )
@@ -29,6 +37,8 @@ class ScenarioAnalysis(BaseModel):
 class FactorGraph(BaseModel):
     """Schema for the causal attribute graph"""
 
+    model_config = _RUN_INPUT_CONFIG
+
     attributes: Dict[str, str] = Field(
         description="Dictionary of attribute_name: description. Each attribute that matters for this entity."
     )
@@ -40,9 +50,18 @@ class FactorGraph(BaseModel):
     )
 
 
+class ScenarioModel(BaseModel):
+    """Scenario analysis and factor graph produced together in one call"""
+
+    scenario_analysis: ScenarioAnalysis
+    factor_graph: FactorGraph
+
+
 class EntityProfile(BaseModel):
     """Schema for a single entity's attributes"""
 
+    model_config = _RUN_INPUT_CONFIG
+
     entity_id: str
     attributes: Dict[str, Any] = Field(
         description="Dictionary of attribute_name: value for this entity"
@@ -63,7 +82,7 @@ class EntityBatch(BaseModel):
 class EntityDecision(BaseModel):
     """Schema for entity's decision - simplified to avoid JSON parsing issues"""
 
-    entity_id: str
+    entity_id: str = Field(description="The entity's ID exactly as given")
     decision: str = Field(
         description="The chosen decision/action from the available options"
     )
@@ -78,6 +97,14 @@ class EntityDecision(BaseModel):
     )
 
 
+class EntityDecisionBatch(BaseModel):
+    """Schema for deciding for several entities in one call"""
+
+    decisions: List[EntityDecision] = Field(
+        description="One decision per entity, each tagged with that entity's entity_id"
+    )
+
+
 class SimulationInsights(BaseModel):
     """Schema for final simulation results"""
 
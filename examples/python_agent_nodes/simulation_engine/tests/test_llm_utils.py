@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+import llm_utils
+
+
+class FakeRouter:
+    """Stands in for an AgentRouter; ``ai`` echoes the prompt after a delay."""
+
+    prefix = "fake"
+
+    def __init__(self, delay=0.01, fail_first=0):
+        self.calls = []
+        self.delay = delay
+        self.fail_first = fail_first
+
+    async def ai(self, prompt, **kwargs):
+        self.calls.append(prompt)
+        await asyncio.sleep(self.delay)
+        if len(self.calls) <= self.fail_first:
+            raise RuntimeError("provider error")
+        return {"answer": prompt}
+
+
+@pytest.fixture(autouse=True)
+def cache_enabled(monkeypatch):
+    monkeypatch.setattr(llm_utils, "AI_CACHE_ENABLED", True)
+    monkeypatch.setattr(llm_utils, "_llm_sem", None)
+    llm_utils._ai_cache.clear()
+    yield
+    llm_utils._ai_cache.clear()
+
+
+def test_concurrent_identical_calls_share_one_request():
+    router = FakeRouter()
+
+    async def main():
+        return await asyncio.gather(
+            *(llm_utils.memoized_ai(router, "same prompt") for _ in range(5))
+        )
+
+    results = asyncio.run(main())
+
+    assert router.calls == ["same prompt"]
+    assert results == [{"answer": "same prompt"}] * 5
+
+
+def test_each_caller_gets_its_own_copy():
+    router = FakeRouter()
+
+    async def main():
+        first = await llm_utils.memoized_ai(router, "prompt")
+        first["answer"] = "mutated"
+        return await llm_utils.memoized_ai(router, "prompt")
+
+    assert asyncio.run(main()) == {"answer": "prompt"}
+    assert len(router.calls) == 1
+
+
+def test_different_kwargs_are_cached_separately():
+    router = FakeRouter()
+
+    async def main():
+        await llm_utils.memoized_ai(router, "prompt", system="a")
+        await llm_utils.memoized_ai(router, "prompt", system="b")
+        await llm_utils.memoized_ai(router, "prompt", system="a")
+
+    asyncio.run(main())
+
+    assert len(router.calls) == 2
+
+
+def test_failed_calls_are_evicted_so_the_next_caller_retries():
+    router = FakeRouter(fail_first=1)
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await llm_utils.memoized_ai(router, "prompt")
+        return await llm_utils.memoized_ai(router, "prompt")
+
+    assert asyncio.run(main()) == {"answer": "prompt"}
+    assert len(router.calls) == 2
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    monkeypatch.setattr(llm_utils, "AI_CACHE_MAXSIZE", 2)
+    router = FakeRouter(delay=0)
+
+    async def main():
+        await llm_utils.memoized_ai(router, "a")
+        await llm_utils.memoized_ai(router, "b")
+        await llm_utils.memoized_ai(router, "a")  # hit: "b" is now the oldest
+        await llm_utils.memoized_ai(router, "c")  # evicts "b"
+        await llm_utils.memoized_ai(router, "a")  # still cached
+        await llm_utils.memoized_ai(router, "b")  # miss
+
+    asyncio.run(main())
+
+    assert router.calls == ["a", "b", "c", "b"]
+    assert len(llm_utils._ai_cache) == 2
+
+
+def test_cache_is_bypassed_unless_enabled(monkeypatch):
+    monkeypatch.setattr(llm_utils, "AI_CACHE_ENABLED", False)
+    router = FakeRouter(delay=0)
+
+    async def main():
+        await llm_utils.memoized_ai(router, "prompt")
+        await llm_utils.memoized_ai(router, "prompt")
+
+    asyncio.run(main())
+
+    assert len(router.calls) == 2
+    assert not llm_utils._ai_cache
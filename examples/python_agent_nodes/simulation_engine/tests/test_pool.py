@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from pool import phase_cap, run_pool
+
+
+def test_results_keep_input_order_when_calls_finish_out_of_order():
+    async def call(item):
+        # Later items finish first
+        await asyncio.sleep(0.01 * (5 - item))
+        return item * 10
+
+    results = asyncio.run(run_pool(call, range(5), limit=5))
+
+    assert results == [0, 10, 20, 30, 40]
+
+
+def test_failed_calls_are_returned_as_their_exception():
+    async def call(item):
+        if item == 1:
+            raise ValueError("boom")
+        return item
+
+    results = asyncio.run(run_pool(call, [0, 1, 2], limit=2))
+
+    assert results[0] == 0 and results[2] == 2
+    assert isinstance(results[1], ValueError)
+    assert str(results[1]) == "boom"
+
+
+def test_at_most_limit_calls_run_at_once():
+    running = 0
+    peak = 0
+
+    async def call(item):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return item
+
+    results = asyncio.run(run_pool(call, range(10), limit=3))
+
+    assert results == list(range(10))
+    assert peak == 3
+
+
+def test_items_are_consumed_lazily():
+    pulled = []
+
+    def items():
+        for i in range(6):
+            pulled.append(i)
+            yield i
+
+    async def main():
+        started = asyncio.Event()
+
+        async def call(item):
+            started.set()
+            await asyncio.sleep(0.05)
+            return item
+
+        pool = asyncio.ensure_future(run_pool(call, items(), limit=2))
+        await started.wait()
+        in_flight = list(pulled)
+        return in_flight, await pool
+
+    in_flight, results = asyncio.run(main())
+
+    assert in_flight == [0, 1]
+    assert results == list(range(6))
+
+
+def test_on_done_counts_finished_calls():
+    seen = []
+
+    async def call(item):
+        return item
+
+    asyncio.run(run_pool(call, range(4), limit=2, on_done=seen.append))
+
+    assert seen == [1, 2, 3, 4]
+
+
+def test_cancelling_the_pool_cancels_running_calls():
+    cancelled = []
+
+    async def call(item):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(item)
+            raise
+
+    async def main():
+        pool = asyncio.ensure_future(run_pool(call, range(5), limit=2))
+        await asyncio.sleep(0.01)
+        pool.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pool
+        await asyncio.sleep(0)
+
+    asyncio.run(main())
+
+    assert sorted(cancelled) == [0, 1]
+
+
+@pytest.mark.parametrize(
+    "n_tasks, cap, min_cap, expected",
+    [
+        (10, 4, 1, 4),
+        (2, 4, 1, 2),
+        (10, 1, 4, 4),
+        (2, 1, 4, 2),
+        (0, 4, 1, 1),
+    ],
+)
+def test_phase_cap(n_tasks, cap, min_cap, expected):
+    assert phase_cap(n_tasks, cap, min_cap) == expected
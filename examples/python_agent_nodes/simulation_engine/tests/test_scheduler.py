@@ -0,0 +1,103 @@
+import asyncio
+
+import pytest
+
+from scheduler import LLMScheduler
+
+
+def _admission_order(strategy, sizes):
+    """Queue one call per size behind a held slot and record who gets in."""
+
+    async def main():
+        scheduler = LLMScheduler(1, strategy)
+        await scheduler.acquire()  # every call below has to wait
+        order = []
+
+        async def call(name, size):
+            async with scheduler.slot(size):
+                order.append(name)
+
+        tasks = [
+            asyncio.ensure_future(call(name, size)) for name, size in sizes.items()
+        ]
+        await asyncio.sleep(0)  # let them all queue up
+        scheduler.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    return asyncio.run(main())
+
+
+SIZES = {"medium": 500, "short": 10, "long": 9000, "short2": 10}
+
+
+def test_balanced_admits_in_arrival_order():
+    assert _admission_order("balanced", SIZES) == ["medium", "short", "long", "short2"]
+
+
+def test_decode_maximal_admits_shortest_prompt_first():
+    # Ties keep arrival order
+    assert _admission_order("decode_maximal", SIZES) == [
+        "short",
+        "short2",
+        "medium",
+        "long",
+    ]
+
+
+def test_prefill_priority_admits_longest_prompt_first():
+    assert _admission_order("prefill_priority", SIZES) == [
+        "long",
+        "medium",
+        "short",
+        "short2",
+    ]
+
+
+def test_cancelled_waiter_is_skipped_and_does_not_leak_its_slot():
+    async def main():
+        scheduler = LLMScheduler(1, "decode_maximal")
+        await scheduler.acquire()
+        order = []
+
+        async def call(name, size):
+            async with scheduler.slot(size):
+                order.append(name)
+
+        cancelled = asyncio.ensure_future(call("cancelled", 1))
+        waiting = asyncio.ensure_future(call("waiting", 100))
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        await asyncio.sleep(0)
+        scheduler.release()
+        await waiting
+        # The slot is free again once everything finished
+        await asyncio.wait_for(scheduler.acquire(), 1)
+        return order
+
+    assert asyncio.run(main()) == ["waiting"]
+
+
+def test_limit_caps_concurrent_holders():
+    async def main():
+        scheduler = LLMScheduler(2)
+        running = 0
+        peak = 0
+
+        async def call():
+            nonlocal running, peak
+            async with scheduler.slot():
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(call() for _ in range(6)))
+        return peak
+
+    assert asyncio.run(main()) == 2
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError, match="LLM_SCHEDULE_STRATEGY"):
+        LLMScheduler(1, "fastest")